@@ -4,11 +4,13 @@ from flask_migrate import Migrate # Added import
 from flask_login import LoginManager, current_user, login_required # Add current_user, login_required
 from flask_misaka import Misaka
 from flask_wtf.csrf import CSRFProtect # Import CSRFProtect
+from db_routing import RoutingSession # Read/write routing session
 
 # Create Extension Instances (BEFORE app creation)
 # We create them here but don't associate them with an app yet
 # Create the SQLAlchemy database extension instance, but not linking it with our Flask app
-db = SQLAlchemy()
+# Its sessions send the reads of GET/HEAD requests to the read replica when one is configured (see db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 # Create Flask-Migrate
 migrate = Migrate()
 # Create Flask-Login
@@ -25,11 +27,21 @@ csrf = CSRFProtect()
 
 # Application Factory Function (Optional but good practice)
 # Or just create the app directly if you prefer for now
-def create_app(): # Start of factory pattern
+def create_app(config_overrides=None): # Start of factory pattern
     app = Flask(__name__) # Create an instance of the Flask application
 
     # Load configuration from config.py
     app.config.from_pyfile('config.py')
+    # Settings that take precedence over config.py (benchmarks compare configurations this way)
+    if config_overrides:
+        app.config.update(config_overrides)
+
+    # Production SQLite profile: pool sizing defaults (see engine_profile.py)
+    from engine_profile import configure_engine_options, init_engine_profile
+    configure_engine_options(app)
+    # Optional read-only replica engine for GET/HEAD requests (see db_routing.py)
+    from db_routing import configure_read_replica, init_read_routing
+    configure_read_replica(app)
 
     # Initialize Extensions with the App
     # Now we associate the extensions with our created app instance
@@ -39,16 +51,38 @@ def create_app(): # Start of factory pattern
     Misaka(app) # Initialize Markdown rendering # Using default settings is usually fine
     csrf.init_app(app) # Initialize CSRF protection for the app
 
+    init_engine_profile(app) # WAL, synchronous=NORMAL, busy timeout, mmap and cache size PRAGMAs
+    init_read_routing(app)
+
     # Import models AFTER db and login_manager have been initialized
     # This import order is now safe because db exists before models.py tries to import it
     from models import User, Department, MediaFile
 
+    # Connect the in-process caches to SQLAlchemy session events (write invalidation)
+    from caches import init_caches, user_cache
+    init_caches(app)
+    from feeds import init_feeds
+    init_feeds(app) # Serialized feed entry caches
+    from media import init_media
+    init_media(app) # Attachment storage settings
+    from facets import init_facets
+    init_facets(app) # Filter panel counts cache
+    from archive import init_archive
+    init_archive(app) # Past events archive settings
+    from live_updates import init_live_updates
+    init_live_updates(app) # Server-Sent Events broadcaster settings
+    from changes import init_changes
+    init_changes(app) # Change log compaction settings
+    from assets import init_assets
+    init_assets(app) # Fingerprinted static files, asset_url() in templates
+
     # Define user_loader (AFTER login_manager and User model are known)
     @login_manager.user_loader
     def load_user(user_id):
         """Callback function to load a user from the user ID stored in the session."""
-        # user_id is stored as a string in the session, so convert to int for query
-        return User.query.get(int(user_id))
+        # user_id is stored as a string in the session, so convert to int for lookup
+        # Served from the in-process identity cache when possible (see caches.UserCache)
+        return user_cache.load(int(user_id))
 
     # Register Blueprints
     from routes.main import main_bp # Import the main Blueprint
@@ -63,6 +97,43 @@ def create_app(): # Start of factory pattern
     from routes.events import event_bp   # Import event Blueprint
     app.register_blueprint(event_bp)    # Register it
 
+    from routes.search import search_bp # Import search Blueprint
+    app.register_blueprint(search_bp)
+
+    from routes.api import api_bp # Import read-only JSON API Blueprint
+    app.register_blueprint(api_bp)
+
+    from routes.feeds import feeds_bp # Import feeds Blueprint (iCalendar)
+    app.register_blueprint(feeds_bp)
+
+    from routes.media import media_bp # Import media Blueprint (attachment downloads)
+    app.register_blueprint(media_bp)
+
+    from routes.assets import assets_bp # Import fingerprinted static files Blueprint
+    app.register_blueprint(assets_bp)
+
+    from routes.live import live_bp # Import live updates Blueprint (Server-Sent Events)
+    app.register_blueprint(live_bp)
+
+    from routes.metrics import metrics_bp # Import Prometheus metrics Blueprint
+    app.register_blueprint(metrics_bp)
+
+    # Optional per-request SQL/template timing, Server-Timing header and slow request log
+    from instrumentation import init_instrumentation
+    init_instrumentation(app)
+
+    # Prometheus metrics: request rate/latency per endpoint, DB pool and cache hit rates (/metrics)
+    from metrics import init_metrics
+    init_metrics(app)
+
+    # gzip/brotli compression of text responses, streamed ones chunk by chunk (see compression.py)
+    from compression import init_compression
+    init_compression(app)
+
+    # Register Custom CLI Commands (e.g. `flask check-query-plans`)
+    from commands import register_commands
+    register_commands(app)
+
     # Custom Error Handlers
     @app.errorhandler(404)
     def not_found_error(error):
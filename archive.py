@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import insert, delete, select, case, func
+from app import db
+
+# Event Archive
+# Events are never deleted, so the event table (and every index the list and dashboard queries
+# use) would grow year after year although nearly all reads ask for upcoming or recent events.
+# `flask archive-events` (run daily from cron) moves events older than EVENT_ARCHIVE_AFTER_DAYS
+# and their attachments to event_archive / media_file_archive in small transactions.
+# The event list only reads the archive when its date filter reaches back that far, the
+# detail page falls back to it, so links to old events keep working.
+
+def archive_cutoff(now=None):
+    """Events before this date are archived."""
+    return (now or datetime.now()) - timedelta(days=current_app.config['EVENT_ARCHIVE_AFTER_DAYS'])
+
+def _event_columns(model):
+    from models import ArchivedEvent
+    # Every column of the archive except archived_at exists on Event with the same name
+    return [model.__table__.c[column.name] for column in ArchivedEvent.__table__.c if column.name != 'archived_at']
+
+def archive_batch(cutoff, batch_size):
+    """Moves up to batch_size events older than cutoff with their attachments, in one transaction.
+
+    Returns (events moved, attachments moved).
+    """
+    from models import Event, ArchivedEvent, MediaFile, ArchivedMediaFile, MediaJob
+    # Archived events keep their ids, the event table never hands them out again (AUTOINCREMENT)
+    ids = [row.id for row in db.session.query(Event.id)
+           .filter(Event.event_date < cutoff)
+           .order_by(Event.event_date).limit(batch_size)] # Oldest first, walks ix_event_event_date
+    if not ids:
+        return 0, 0
+
+    event_names = [column.name for column in _event_columns(Event)]
+    db.session.execute(insert(ArchivedEvent).from_select(
+        event_names + ['archived_at'],
+        select(*_event_columns(Event), func.now()).where(Event.id.in_(ids))
+    ))
+    media_names = [column.name for column in ArchivedMediaFile.__table__.c]
+    media_columns = [
+        # Queued preview jobs are dropped with the attachment, an archived file won't get a preview any more
+        case((MediaFile.preview_status == 'pending', None), else_=MediaFile.preview_status) if name == 'preview_status'
+        else MediaFile.__table__.c[name]
+        for name in media_names
+    ]
+    attachments = db.session.execute(insert(ArchivedMediaFile).from_select(
+        media_names, select(*media_columns).where(MediaFile.event_id.in_(ids))
+    )).rowcount
+    # Bulk deletes skip the ORM cascades, remove the children first
+    media_ids = select(MediaFile.id).where(MediaFile.event_id.in_(ids)).scalar_subquery()
+    no_sync = {'synchronize_session': False}
+    db.session.execute(delete(MediaJob).where(MediaJob.media_file_id.in_(media_ids)), execution_options=no_sync)
+    db.session.execute(delete(MediaFile).where(MediaFile.event_id.in_(ids)), execution_options=no_sync)
+    # The full-text search triggers remove the events from event_fts
+    db.session.execute(delete(Event).where(Event.id.in_(ids)), execution_options=no_sync)
+    db.session.commit()
+    return len(ids), attachments
+
+def archive_events(cutoff, batch_size=500, log=None):
+    """Moves all events older than cutoff in batches. Returns (events moved, attachments moved)."""
+    events = attachments = 0
+    while True:
+        moved, moved_attachments = archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        events += moved
+        attachments += moved_attachments
+        if log:
+            log(f'Archived {events} events so far.')
+    return events, attachments
+
+def newest_archived_date():
+    """event_date of the most recent archived event, None if the archive is empty (index lookup)."""
+    from models import ArchivedEvent
+    return db.session.query(func.max(ArchivedEvent.event_date)).scalar()
+
+def archive_reaches(start_date, end_date):
+    """Whether a date filter of the event list covers archived events.
+
+    Without a date filter the list shows the event table only (upcoming and recent events),
+    set a start date before the archive boundary to browse older ones.
+    """
+    if start_date is None and end_date is None:
+        return False
+    newest = newest_archived_date()
+    return newest is not None and (start_date is None or start_date <= newest)
+
+def init_archive(app):
+    """Archive settings defaults. Called from create_app."""
+    app.config.setdefault('EVENT_ARCHIVE_AFTER_DAYS', 365)
+    app.config.setdefault('EVENT_ARCHIVE_BATCH_SIZE', 500)
@@ -0,0 +1,93 @@
+import os
+import json
+import gzip
+import hashlib
+import brotli
+from flask import current_app, url_for
+
+# Fingerprinted Static Assets
+# `flask build-assets` copies the CSS/JS/SVG files under static/ to static/dist/ with a hash of their
+# content in the name (css/theme.css -> css/theme.3f2a1b9c0d4e.css) and writes .gz and .br variants
+# next to them. Templates link them with asset_url('css/theme.css'), the hashed URL changes whenever
+# the file does, so browsers may keep it for a year without revalidating (see routes/assets.py).
+# Without a build (development), asset_url falls back to the normal static URL.
+
+# Files that are fingerprinted, relative to the static folder
+ASSET_EXTENSIONS = {'.css', '.js', '.svg'}
+# Output folder inside static/, and the manifest that maps source names to hashed names
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Hex digits of the content hash in the file name
+FINGERPRINT_LENGTH = 12
+# Precompressed variants: Accept-Encoding token -> file suffix, in order of preference
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+def dist_root(app=None):
+    return os.path.join((app or current_app).static_folder, DIST_DIR)
+
+def fingerprinted_name(filename, content):
+    name, extension = os.path.splitext(filename)
+    digest = hashlib.sha256(content).hexdigest()[:FINGERPRINT_LENGTH]
+    return f'{name}.{digest}{extension}'
+
+def _write_file(path, data):
+    # Write to a temporary name and rename, so a running server never sends half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as output:
+        output.write(data)
+    os.replace(temp_path, path)
+
+def build_assets(app):
+    """Writes the hashed files, their .gz/.br variants and the manifest. Returns the manifest.
+
+    Files of earlier builds are kept: pages browsers still have cached (304 answers) link to them.
+    """
+    static_folder = app.static_folder
+    output_root = dist_root(app)
+    manifest = {}
+    for directory, subdirectories, filenames in os.walk(static_folder):
+        if directory == static_folder and DIST_DIR in subdirectories:
+            subdirectories.remove(DIST_DIR) # Don't fingerprint our own output
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() not in ASSET_EXTENSIONS:
+                continue
+            source = os.path.join(directory, filename)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as source_file:
+                content = source_file.read()
+            hashed = fingerprinted_name(relative, content)
+            target = os.path.join(output_root, hashed)
+            if os.path.exists(target + ENCODINGS['br']):
+                manifest[relative] = hashed # Unchanged since an earlier build
+                continue
+            _write_file(target, content)
+            # Highest compression levels, the files are compressed once per deploy
+            _write_file(target + ENCODINGS['gzip'], gzip.compress(content, compresslevel=9, mtime=0))
+            _write_file(target + ENCODINGS['br'], brotli.compress(content, quality=11))
+            manifest[relative] = hashed
+    _write_file(os.path.join(output_root, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    app.extensions['asset_manifest'] = manifest
+    return manifest
+
+def load_manifest(app):
+    """Hashed names of the last build, {} if there was none."""
+    path = os.path.join(dist_root(app), MANIFEST_NAME)
+    try:
+        with open(path) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+def asset_url(filename, **values):
+    """Like url_for('static', filename=...), but returns the fingerprinted URL once assets are built."""
+    hashed = current_app.extensions['asset_manifest'].get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename, **values)
+    return url_for('assets.asset', filename=hashed, **values)
+
+def init_assets(app):
+    """Loads the manifest and makes asset_url available to templates. Called from create_app."""
+    app.config.setdefault('ASSET_CACHE_MAX_AGE', 365 * 24 * 3600)
+    app.extensions['asset_manifest'] = load_manifest(app)
+    app.add_template_global(asset_url)
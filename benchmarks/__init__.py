@@ -0,0 +1,3 @@
+# Benchmarks
+# Scripts that seed a throwaway SQLite database with realistic data and time the app against it.
+# Run them from the project folder, e.g. `python -m benchmarks.search --rows 100000`
@@ -0,0 +1,99 @@
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.seed import make_app, seed
+
+# Response Compression Benchmark
+# Renders the main pages, the JSON API and the feeds of a seeded database once, then compresses each
+# body with the settings compression.py can use. Reports bytes saved against the CPU time spent per
+# response, and the end-to-end request time through the middleware with and without Accept-Encoding.
+#
+#   python -m benchmarks.compression --db /tmp/bench.db
+
+PAGES = [
+    ('index', '/'),
+    ('notice_list', '/notices/'),
+    ('event_list', '/events/'),
+    ('notice_detail', None), # Filled in with the newest notice
+    ('api_notices', '/api/v1/notices?limit=100'),
+    ('api_ndjson', '/api/v1/notices?format=ndjson&fields=id,title,issue_date'),
+    ('notices_atom', '/feeds/notices.atom'),
+    ('events_ics', '/feeds/events.ics'),
+]
+# (label, encoding, level): gzip levels 1-9, brotli qualities 0-11
+SETTINGS = [('gzip-1', 'gzip', 1), ('gzip-6', 'gzip', 6), ('gzip-9', 'gzip', 9),
+            ('br-1', 'br', 1), ('br-4', 'br', 4), ('br-11', 'br', 11)]
+
+def median_ms(function, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gzip/brotli response compression on the app\'s pages.')
+    parser.add_argument('--rows', type=int, default=20_000, help='Notices and events to seed (each).')
+    parser.add_argument('--db', help='Existing seeded database to reuse (seeded from scratch if missing).')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='compression-bench-'), 'bench.db')
+    fresh = not os.path.exists(db_path)
+    app = make_app(db_path)
+    app.config['WTF_CSRF_ENABLED'] = False # The benchmark posts the login form directly
+    if fresh:
+        print(f'Seeding {args.rows} notices and {args.rows} events into {db_path} ...')
+        seed(app, notices=args.rows, events=args.rows)
+
+    from app import db
+    from models import User, Notice
+    from compression import BrotliStream, GzipStream
+
+    with app.app_context():
+        admin = db.session.query(User.username).filter(User.role == 'admin').first()
+        newest_notice = db.session.query(Notice.id).order_by(Notice.id.desc()).first()
+    pages = [(name, url or f'/notices/{newest_notice.id}') for name, url in PAGES]
+
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username_or_email': admin.username, 'password': 'password'})
+    if response.status_code != 302:
+        raise SystemExit(f'Login failed with status {response.status_code}')
+
+    bodies = {}
+    for name, url in pages:
+        client.get(url) # Warm the caches
+        response = client.get(url, headers={'Accept-Encoding': 'identity'})
+        bodies[name] = [response.get_data()] if not response.is_streamed else list(response.response)
+
+    def compress(setting, chunks):
+        _, encoding, level = setting
+        stream = BrotliStream(level) if encoding == 'br' else GzipStream(level)
+        return b''.join(stream.compress(chunk) for chunk in chunks) + stream.finish()
+
+    print(f'Compressed size (% of the original) and CPU ms per response, median of {args.repeat}\n')
+    print(f'{"page":<15}{"bytes":>9}' + ''.join(f'{label:>16}' for label, _, _ in SETTINGS))
+    for name, chunks in bodies.items():
+        size = sum(len(chunk) for chunk in chunks)
+        cells = []
+        for setting in SETTINGS:
+            compressed = len(compress(setting, chunks))
+            elapsed = median_ms(lambda: compress(setting, chunks), args.repeat)
+            cells.append(f'{compressed * 100 / size:>6.1f}% {elapsed:>6.2f}ms')
+        print(f'{name:<15}{size:>9}' + ''.join(f'{cell:>16}' for cell in cells))
+
+    # Through the middleware: what a request costs with the configured settings
+    print(f'\nRequest time with the configured middleware settings (median ms of {args.repeat})\n')
+    print(f'{"page":<15}{"identity":>10}{"gzip":>10}{"br":>10}{"br bytes":>10}')
+    for name, url in pages:
+        times = [median_ms(lambda: client.get(url, headers={'Accept-Encoding': encoding}).get_data(), args.repeat)
+                 for encoding in ('identity', 'gzip', 'br')]
+        size = len(client.get(url, headers={'Accept-Encoding': 'br'}).get_data())
+        print(f'{name:<15}' + ''.join(f'{value:>10.2f}' for value in times) + f'{size:>10}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import logging
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from datetime import datetime
+
+from benchmarks.seed import make_app, seed
+from benchmarks.load import percentile, git_revision
+
+# Concurrent Reader/Writer Benchmark
+# Runs reader processes (notice list and detail pages) next to writer processes (posting notices
+# through /notices/new) against copies of one seeded database, once per engine profile, and reports
+# reads/s, writes/s, latency and failed requests ("database is locked" shows up as 500s).
+# Every process is a separate worker with its own connection pool, like Gunicorn workers.
+#
+#   python -m benchmarks.concurrency --db /tmp/concurrency.db --readers 6 --writers 2 --duration 15
+
+# Engine profiles compared, as config overrides (see engine_profile.py)
+PROFILES = {
+    # SQLite's defaults: rollback journal, synchronous=FULL, SQLAlchemy's default pool
+    'default': {'SQLITE_PRAGMAS': {}, 'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30}},
+    # The production profile as create_app applies it
+    'production': {},
+}
+
+def copy_database(source, target, journal_mode):
+    """Copies the seeded database (consistently, even in WAL mode) and sets its journal mode."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    with sqlite3.connect(source) as source_connection, sqlite3.connect(target) as target_connection:
+        source_connection.backup(target_connection)
+        target_connection.execute(f'PRAGMA journal_mode = {journal_mode}')
+
+def run_worker(profile, db_path, role, index, duration, barrier, results, admin):
+    """One worker process: logs in, waits for the others, then reads or writes for duration seconds."""
+    # The copy is already migrated, so the app is created directly (no upgrade per worker)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    from app import create_app
+    app = create_app(PROFILES[profile])
+    app.config['WTF_CSRF_ENABLED'] = False # The benchmark posts the forms directly
+    app.logger.setLevel(logging.CRITICAL) # Failed requests are counted, not logged
+    client = app.test_client()
+    status = client.post('/auth/login', data={'username_or_email': admin, 'password': 'password'}).status_code
+    if status != 302:
+        sys.exit(f'Login failed with status {status}')
+    from app import db
+    from models import Notice
+    with app.app_context():
+        notice_ids = [row.id for row in db.session.query(Notice.id)]
+
+    rng = random.Random(index)
+    durations, statuses = [], {}
+    barrier.wait()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        if role == 'writer':
+            response = client.post('/notices/new', data={
+                'title': f'Concurrency benchmark notice {index}-{len(durations)}',
+                'content': 'Posted by the **concurrency benchmark**.\n\n- one\n- two',
+                'department_id': 0,
+            })
+        elif rng.random() < 0.5:
+            response = client.get(f'/notices/{rng.choice(notice_ids)}')
+        else:
+            response = client.get('/notices/')
+        durations.append((time.perf_counter() - start) * 1000)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    results.put((role, durations, statuses))
+
+def summarize(durations, statuses, duration, ok_statuses):
+    durations.sort()
+    failed = sum(count for status, count in statuses.items() if status not in ok_statuses)
+    return {
+        'requests': len(durations),
+        'per_second': round(len(durations) / duration, 1),
+        'p50_ms': round(percentile(durations, 0.50), 3) if durations else None,
+        'p95_ms': round(percentile(durations, 0.95), 3) if durations else None,
+        'p99_ms': round(percentile(durations, 0.99), 3) if durations else None,
+        'mean_ms': round(statistics.fmean(durations), 3) if durations else None,
+        'failed': failed,
+        'statuses': statuses,
+    }
+
+def run_profile(profile, db_path, readers, writers, duration, admin):
+    context = multiprocessing.get_context('spawn') # Fresh interpreter per worker, like separate server workers
+    barrier = context.Barrier(readers + writers)
+    results = context.Queue()
+    roles = ['reader'] * readers + ['writer'] * writers
+    processes = [
+        context.Process(target=run_worker, args=(profile, db_path, role, index, duration, barrier, results, admin))
+        for index, role in enumerate(roles)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    by_role = {}
+    for role, durations, statuses in collected:
+        merged = by_role.setdefault(role, ([], {}))
+        merged[0].extend(durations)
+        for status, count in statuses.items():
+            merged[1][status] = merged[1].get(status, 0) + count
+    return {
+        'reads': summarize(*by_role.get('reader', ([], {})), duration, {'200'}),
+        'writes': summarize(*by_role.get('writer', ([], {})), duration, {'302'}),
+    }
+
+def print_results(results):
+    print(f'{"profile":<12}{"kind":<8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"failed":>8}')
+    for profile, kinds in results['profiles'].items():
+        for kind, stats in kinds.items():
+            if not stats['requests']:
+                continue
+            print(f'{profile:<12}{kind:<8}{stats["per_second"]:>9.1f}{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}{stats["failed"]:>8}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Mixed readers and notice writers in parallel worker processes, per engine profile.')
+    parser.add_argument('--rows', type=int, default=20_000, help='Notices and events to seed (each) when the database is created.')
+    parser.add_argument('--db', help='Seeded database to copy for each profile (seeded from scratch if missing).')
+    parser.add_argument('--readers', type=int, default=6, help='Reader processes.')
+    parser.add_argument('--writers', type=int, default=2, help='Writer processes posting notices.')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds each profile runs.')
+    parser.add_argument('--profiles', default=','.join(PROFILES), help='Comma-separated profiles to run.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='concurrency-bench-'), 'bench.db')
+    if not os.path.exists(db_path):
+        print(f'Seeding {args.rows} notices and {args.rows} events into {db_path} ...')
+        seed(make_app(db_path), notices=args.rows, events=args.rows)
+    with sqlite3.connect(db_path) as connection:
+        admin = connection.execute("SELECT username FROM user WHERE role = 'admin' ORDER BY id LIMIT 1").fetchone()[0]
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+            'readers': args.readers,
+            'writers': args.writers,
+            'duration_s': args.duration,
+            'cpus': os.cpu_count(), # With fewer CPUs than processes the run measures CPU time, not lock waits
+        },
+        'profiles': {},
+    }
+    print(f'{args.readers} readers, {args.writers} writers, {args.duration:g} s per profile')
+    for profile in args.profiles.split(','):
+        # Each profile starts from an identical copy, writes of one run don't slow down the next
+        copy_path = f'{db_path}.{profile}'
+        copy_database(db_path, copy_path, 'WAL' if profile == 'production' else 'DELETE')
+        results['profiles'][profile] = run_profile(profile, copy_path, args.readers, args.writers, args.duration, admin)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+import os
+import re
+import math
+import sys
+import html
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import statistics
+import subprocess
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.seed import make_app, seed, CATEGORIES
+
+# Route Load Benchmark
+# Drives the app through the Flask test client (default) or a local threaded WSGI server (--wsgi)
+# over the filter/sort/page combinations the list routes accept, plus the dashboard, detail pages
+# and login. Reports p50/p95/p99 latency, throughput and SQL statements per request for each route,
+# and saves the results as JSON so runs can be compared (--compare old.json).
+#
+#   python -m benchmarks.load --rows 100000 --db /tmp/bench.db --output before.json
+#   python -m benchmarks.load --db /tmp/bench.db --output after.json --compare before.json
+#
+# The in-process caches (users, departments, dashboard) are warm after the warm-up pass, like in production.
+
+SQL_HEADER = 'X-Bench-SQL-Statements'
+# Every login hashes the password (~0.5 s by design), so the login route gets fewer requests
+LOGIN_REQUESTS = 20
+NEXT_LINK = re.compile(r'href="([^"]*after=[^"]*)" aria-label="Next"')
+
+def install_sql_counter(app):
+    """Counts the SQL statements of each request and reports them in a response header."""
+    from flask import g, has_app_context
+    from sqlalchemy import event
+    from app import db
+
+    with app.app_context():
+        engines = list(db.engines.values()) # The primary and the read replica, if configured
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        if has_app_context() and 'bench_sql' in g:
+            g.bench_sql += 1
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count_statement)
+
+    @app.before_request
+    def start_counting():
+        g.bench_sql = 0
+
+    @app.after_request
+    def report_count(response):
+        response.headers[SQL_HEADER] = str(g.get('bench_sql', 0))
+        return response
+
+# Request Drivers
+class TestClientDriver:
+    """Sends requests through the Flask test client (no network, no server threads)."""
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, url, data=None):
+        response = self.client.open(url, method=method, data=data)
+        return response.status_code, response.data, int(response.headers.get(SQL_HEADER, 0))
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpDriver:
+    """Sends real HTTP requests to a local WSGI server, with its own cookie jar (one per thread)."""
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, url, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        try:
+            with self.opener.open(urllib.request.Request(self.base_url + url, data=body, method=method)) as response:
+                return response.status, response.read(), int(response.headers.get(SQL_HEADER, 0))
+        except urllib.error.HTTPError as error: # Redirects (login) and error statuses
+            return error.code, error.read(), int(error.headers.get(SQL_HEADER, 0))
+
+def start_wsgi_server(app):
+    """Serves the app from a threaded werkzeug server on a free local port, returns its base URL."""
+    import logging
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR) # No access log lines in the report
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+# Request Matrix
+def list_urls(driver, path, combinations, pages):
+    """Expands list filter/sort combinations into page URLs by following the Next links."""
+    urls = []
+    for params in combinations:
+        url = path + '?' + urllib.parse.urlencode(params)
+        for _ in range(pages):
+            urls.append(url)
+            status, body, _ = driver.request('GET', url)
+            match = NEXT_LINK.search(body.decode())
+            if status != 200 or not match:
+                break
+            url = html.unescape(match.group(1))
+    return urls
+
+def build_scenarios(app, driver, counts, pages, rng):
+    """Returns {route name: [(method, url, form data), ...]}."""
+    from app import db
+    from models import Notice, Event
+
+    with app.app_context():
+        notice_ids = [row.id for row in db.session.query(Notice.id)]
+        event_ids = [row.id for row in db.session.query(Event.id)]
+
+    department_filters = [{}, {'department_id': 1}]
+    date_filters = [{}, {'start_date': '2025-01-01', 'end_date': '2025-06-30'}]
+    orders = ['asc', 'desc']
+
+    notice_combinations = [
+        {**department, **dates, 'sort_by': sort_by, 'sort_order': order}
+        for department in department_filters for dates in date_filters
+        for sort_by in ['date', 'title', 'department'] for order in orders
+    ]
+    event_combinations = [
+        {**department, **dates, **category, 'sort_by': sort_by, 'sort_order': order}
+        for department in department_filters for dates in date_filters
+        for category in [{}, {'category': CATEGORIES[0]}]
+        for sort_by in ['date', 'title', 'category', 'department'] for order in orders
+    ]
+    return {
+        'index': [('GET', '/', None)],
+        'notice_list': [('GET', url, None) for url in list_urls(driver, '/notices/', notice_combinations, pages)],
+        'event_list': [('GET', url, None) for url in list_urls(driver, '/events/', event_combinations, pages)],
+        'notice_detail': [('GET', f'/notices/{notice_id}', None) for notice_id in rng.sample(notice_ids, min(200, len(notice_ids)))],
+        'event_detail': [('GET', f'/events/{event_id}', None) for event_id in rng.sample(event_ids, min(200, len(event_ids)))],
+        'login': [('POST', '/auth/login', {'username_or_email': counts['student'], 'password': 'password'})],
+    }
+
+# Measurement
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def run_scenario(make_driver, login, requests, total, concurrency):
+    """Sends total requests cycling through the scenario's request list, returns its statistics."""
+    plan = [requests[index % len(requests)] for index in range(total)]
+    durations, statements, sizes, statuses = [], [], [], {}
+    by_url = {} # url -> slowest duration, to point at the filter/sort combinations behind the tail
+    lock = threading.Lock()
+
+    # Log the clients in before the clock starts (password hashing is slow on purpose)
+    drivers = []
+    for _ in range(concurrency):
+        drivers.append(make_driver())
+        login(drivers[-1])
+
+    def worker(driver, chunk):
+        for method, url, data in chunk:
+            if method == 'POST' and url == '/auth/login':
+                driver = make_driver() # Every login starts logged out
+            start = time.perf_counter()
+            status, body, sql = driver.request(method, url, data)
+            elapsed = time.perf_counter() - start
+            with lock:
+                durations.append(elapsed * 1000)
+                by_url[url] = max(by_url.get(url, 0.0), elapsed * 1000)
+                statements.append(sql)
+                sizes.append(len(body))
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    chunks = [plan[index::concurrency] for index in range(concurrency)]
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, drivers, chunks))
+    wall = time.perf_counter() - wall_start
+
+    durations.sort()
+    return {
+        'requests': total,
+        'p50_ms': round(percentile(durations, 0.50), 3),
+        'p95_ms': round(percentile(durations, 0.95), 3),
+        'p99_ms': round(percentile(durations, 0.99), 3),
+        'mean_ms': round(statistics.fmean(durations), 3),
+        'max_ms': round(durations[-1], 3),
+        'throughput_rps': round(total / wall, 1),
+        'sql_mean': round(statistics.fmean(statements), 2),
+        'sql_max': max(statements),
+        'bytes_mean': int(statistics.fmean(sizes)),
+        'statuses': statuses,
+        'slowest_urls': [
+            {'url': url, 'max_ms': round(duration, 3)}
+            for url, duration in sorted(by_url.items(), key=lambda item: item[1], reverse=True)[:5]
+        ],
+    }
+
+def git_revision(path):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Reporting
+def print_results(results, baseline=None):
+    header = f'{"route":<15}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"sql":>7}'
+    if baseline:
+        header += f'{"p50 vs base":>13}{"p95 vs base":>13}{"sql vs base":>13}'
+    print(header)
+    for route, stats in results['routes'].items():
+        line = f'{route:<15}{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}{stats["p99_ms"]:>9.2f}{stats["throughput_rps"]:>9.1f}{stats["sql_mean"]:>7.2f}'
+        base = (baseline or {}).get('routes', {}).get(route)
+        if base:
+            def change(key):
+                return f'{(stats[key] - base[key]) / base[key] * 100:+.1f}%' if base[key] else 'n/a'
+            line += f'{change("p50_ms"):>13}{change("p95_ms"):>13}{stats["sql_mean"] - base["sql_mean"]:>+13.2f}'
+        print(line)
+    statuses = {route: stats['statuses'] for route, stats in results['routes'].items() if set(stats['statuses']) - {'200', '302'}}
+    if statuses:
+        print(f'Unexpected statuses: {statuses}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the main routes on a seeded database.')
+    parser.add_argument('--rows', type=int, default=100_000, help='Notices and events to seed (each) when the database is created.')
+    parser.add_argument('--db', help='Seeded database to reuse (seeded from scratch if missing).')
+    parser.add_argument('--requests', type=int, default=200, help='Timed requests per route.')
+    parser.add_argument('--pages', type=int, default=3, help='List pages to follow per filter/sort combination.')
+    parser.add_argument('--wsgi', action='store_true', help='Go through a local threaded WSGI server instead of the test client.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads (with --wsgi).')
+    parser.add_argument('--routes', help='Comma-separated routes to run (default: all).')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--compare', help='Results JSON of an earlier run to compare against.')
+    args = parser.parse_args()
+    if args.concurrency > 1 and not args.wsgi:
+        parser.error('--concurrency needs --wsgi (the test client runs requests in the calling thread)')
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='load-bench-'), 'bench.db')
+    fresh = not os.path.exists(db_path)
+    app = make_app(db_path)
+    app.config['WTF_CSRF_ENABLED'] = False # The benchmark posts the login form directly
+    if fresh:
+        print(f'Seeding {args.rows} notices and {args.rows} events into {db_path} ...')
+        seed(app, notices=args.rows, events=args.rows)
+    from app import db
+    from models import Notice, Event, User
+    with app.app_context():
+        counts = {
+            'notices': db.session.query(Notice).count(),
+            'events': db.session.query(Event).count(),
+            'student': db.session.query(User.username).filter_by(role='student').order_by(User.id.desc()).limit(1).scalar(),
+            'admin': db.session.query(User.username).filter_by(role='admin').order_by(User.id).limit(1).scalar(),
+        }
+    install_sql_counter(app)
+
+    if args.wsgi:
+        base_url = start_wsgi_server(app)
+        make_driver = lambda: HttpDriver(base_url)
+    else:
+        make_driver = lambda: TestClientDriver(app)
+
+    def login(driver):
+        # Browse as the admin, so every page shows its full set of controls
+        status, _, _ = driver.request('POST', '/auth/login', {'username_or_email': counts['admin'], 'password': 'password'})
+        if status != 302:
+            sys.exit(f'Login failed with status {status}')
+
+    discovery = make_driver()
+    login(discovery)
+    scenarios = build_scenarios(app, discovery, counts, args.pages, random.Random(1))
+    if args.routes:
+        wanted = args.routes.split(',')
+        scenarios = {route: requests for route, requests in scenarios.items() if route in wanted}
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(app.root_path),
+            'python': platform.python_version(),
+            'mode': 'wsgi' if args.wsgi else 'test-client',
+            'concurrency': args.concurrency,
+            'requests_per_route': args.requests,
+            'notices': counts['notices'],
+            'events': counts['events'],
+        },
+        'routes': {},
+    }
+    print(f'{counts["notices"]} notices, {counts["events"]} events, {results["meta"]["mode"]}, concurrency {args.concurrency}')
+    for route, requests in scenarios.items():
+        # Warm-up pass (caches, SQLite page cache, Jinja template compilation), not timed
+        total = min(args.requests, LOGIN_REQUESTS) if route == 'login' else args.requests
+        run_scenario(make_driver, login, requests, min(len(requests), total), 1)
+        results['routes'][route] = run_scenario(make_driver, login, requests, total, args.concurrency)
+        results['routes'][route]['distinct_urls'] = len({url for _, url, _ in requests})
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f'Results written to {args.output}')
+
+if __name__ == '__main__':
+    main()
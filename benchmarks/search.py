@@ -0,0 +1,65 @@
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+from benchmarks.seed import make_app, seed
+
+# Full-Text Search Benchmark
+# Compares the FTS5 queries behind /search with the naive LIKE '%term%' alternative
+# on a seeded corpus (100k notices and 100k events by default).
+
+# From very broad to very selective (see the Zipf-weighted vocabulary in benchmarks.seed)
+QUERIES = ['exam', 'scholarship deadline', 'hackathon', 'convocation ceremony', 'wifi portal update', 'cs204', 'cs4', 'kamiro']
+
+def timed(function, repeat):
+    """Runs function repeat times, returns (median ms, max ms, last result)."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations), max(durations), result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark FTS5 search against LIKE on a seeded corpus.')
+    parser.add_argument('--rows', type=int, default=100_000, help='Notices and events to seed (each).')
+    parser.add_argument('--db', help='Existing seeded database to reuse (seeded from scratch if missing).')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='search-bench-'), 'bench.db')
+    fresh = not os.path.exists(db_path)
+    app = make_app(db_path)
+    if fresh:
+        print(f'Seeding {args.rows} notices and {args.rows} events into {db_path} ...')
+        seed(app, notices=args.rows, events=args.rows)
+
+    from app import db
+    from models import Notice
+    from sqlalchemy import or_, func
+    from routes.search import NOTICE_SEARCH_SQL, build_match_expression
+
+    with app.app_context():
+        total = db.session.query(func.count(Notice.id)).scalar()
+        print(f'{total} notices\n')
+        print(f'{"query":<24}{"fts top20 ms":>14}{"like top20 ms":>15}{"fts all ms":>12}{"like all ms":>13}{"matches":>9}')
+
+        for text in QUERIES:
+            match = build_match_expression(text)
+            terms = text.split()
+
+            def like_filter():
+                # Every word has to appear in the title or the content, like the FTS query
+                return [or_(Notice.title.like(f'%{word}%'), Notice.content.like(f'%{word}%')) for word in terms]
+
+            fts_top, _, _ = timed(lambda: db.session.execute(NOTICE_SEARCH_SQL, {'match': match, 'limit': 20}).all(), args.repeat)
+            like_top, _, _ = timed(lambda: db.session.query(Notice.id).filter(*like_filter()).order_by(Notice.issue_date.desc()).limit(20).all(), args.repeat)
+            fts_all, _, fts_count = timed(lambda: db.session.execute(db.text('SELECT count(*) FROM notice_fts WHERE notice_fts MATCH :match'), {'match': match}).scalar(), args.repeat)
+            like_all, _, _ = timed(lambda: db.session.query(func.count(Notice.id)).filter(*like_filter()).scalar(), args.repeat)
+            print(f'{text:<24}{fts_top:>14.2f}{like_top:>15.2f}{fts_all:>12.2f}{like_all:>13.2f}{fts_count:>9}')
+
+if __name__ == '__main__':
+    main()
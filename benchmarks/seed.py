@@ -0,0 +1,153 @@
+import os
+import random
+import argparse
+from datetime import datetime, timedelta
+
+# Deterministic Data Seeder
+# Same seed -> same departments, users, notices and events, so benchmark runs are comparable.
+
+DEPARTMENTS = [
+    'Computer Science', 'Electronics', 'Mechanical', 'Civil', 'Electrical', 'Chemical',
+    'Mathematics', 'Physics', 'Chemistry', 'Humanities', 'Management', 'Biotechnology'
+]
+CATEGORIES = ['Academic', 'Cultural', 'Sports', 'Workshop', 'Seminar', 'Other']
+VENUES = ['Main Auditorium', 'Seminar Hall A', 'Seminar Hall B', 'Sports Complex', 'Library Lawn', 'Lab Block 3', 'Open Air Theatre']
+WORDS = (
+    'exam schedule semester result registration deadline library hostel fee scholarship '
+    'placement internship workshop seminar lecture assignment project submission lab '
+    'attendance holiday notice revised timetable admit card convocation ceremony sports '
+    'festival cultural club meeting department faculty student council election hackathon '
+    'guest talk research paper conference orientation induction canteen transport bus '
+    'campus maintenance wifi portal update mandatory optional venue auditorium quiz'
+).split()
+
+# Rarer words (course codes, names, places) follow the common ones with Zipf-like frequencies,
+# so keyword searches range from very broad ("exam") to very selective (a single course code)
+SYLLABLES = ['ka', 'ro', 'mi', 'tel', 'san', 'dor', 'vi', 'lun', 'pra', 'zen', 'bo', 'qua', 'ris', 'mon', 'ta', 'gen']
+_vocabulary_rng = random.Random(7)
+VOCABULARY = WORDS + sorted({
+    ''.join(_vocabulary_rng.choices(SYLLABLES, k=_vocabulary_rng.randint(2, 3))) for _ in range(4000)
+}) + [f'cs{number}' for number in range(101, 500)]
+VOCABULARY_WEIGHTS = []
+for _rank in range(len(VOCABULARY)):
+    VOCABULARY_WEIGHTS.append((VOCABULARY_WEIGHTS[-1] if VOCABULARY_WEIGHTS else 0) + 1 / (_rank + 1))
+
+def words(rng, count):
+    """count words drawn from the Zipf-weighted vocabulary."""
+    return rng.choices(VOCABULARY, cum_weights=VOCABULARY_WEIGHTS, k=count)
+
+def make_app(db_path, config_overrides=None):
+    """Creates the app against a SQLite file at db_path and applies all migrations."""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    from app import create_app
+    from flask_migrate import upgrade
+    app = create_app(config_overrides)
+    with app.app_context():
+        upgrade(directory=os.path.join(app.root_path, 'migrations'))
+    return app
+
+def _sentence(rng, min_words=6, max_words=16):
+    return ' '.join(words(rng, rng.randint(min_words, max_words))).capitalize() + '.'
+
+def markdown_body(rng):
+    """A Markdown body with the usual notice structure: bold lead-in, paragraphs, heading and a list."""
+    paragraphs = [' '.join(_sentence(rng) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 3))]
+    lead_in = ' '.join(words(rng, 2)).capitalize()
+    paragraphs[0] = f'**{lead_in}:** ' + paragraphs[0]
+    if rng.random() < 0.5:
+        paragraphs.insert(1, '## ' + ' '.join(words(rng, 3)).title())
+    if rng.random() < 0.6:
+        paragraphs.append('\n'.join('- ' + _sentence(rng, 3, 8) for _ in range(rng.randint(2, 5))))
+    return '\n\n'.join(paragraphs)
+
+def title(rng):
+    return ' '.join(words(rng, rng.randint(3, 7))).capitalize()
+
+def seed(app, notices=100_000, events=100_000, users=50, seed_value=42, batch_size=5000):
+    """Fills an empty database. Every user's password is 'password'.
+
+    Returns a dict with the row counts and the usernames of an admin, a publisher and a student.
+    """
+    from app import db
+    from models import User, Department, Notice, Event, render_markdown
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed_value)
+    now = datetime(2026, 1, 1) # Fixed "now" so the data doesn't depend on the day the benchmark runs
+    with app.app_context():
+        db.session.add_all([Department(name=name) for name in DEPARTMENTS])
+        db.session.commit()
+        department_ids = [row.id for row in db.session.query(Department.id).order_by(Department.id)]
+
+        # Hashing is deliberately slow, every seeded user shares one hash
+        password_hash = generate_password_hash('password', method='pbkdf2:sha256')
+        roles = ['admin'] + ['publisher'] * (users // 5) + ['student'] * (users - 1 - users // 5)
+        db.session.execute(db.insert(User), [
+            {
+                'username': f'{role}{index}',
+                'email': f'{role}{index}@college.example',
+                'password_hash': password_hash,
+                'role': role,
+                'department_id': rng.choice(department_ids),
+            }
+            for index, role in enumerate(roles)
+        ])
+        db.session.commit()
+        publisher_ids = [row.id for row in db.session.query(User.id).filter(User.role.in_(['admin', 'publisher']))]
+
+        def notice_row():
+            content = markdown_body(rng)
+            content_html, excerpt = render_markdown(content)
+            return {
+                'title': title(rng),
+                'content': content,
+                'content_html': content_html,
+                'excerpt': excerpt,
+                'issue_date': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 3)),
+                'user_id': rng.choice(publisher_ids),
+                'department_id': rng.choice(department_ids + [None]),
+            }
+
+        def event_row():
+            description = markdown_body(rng)
+            content_html, excerpt = render_markdown(description)
+            return {
+                'title': title(rng),
+                'description': description,
+                'content_html': content_html,
+                'excerpt': excerpt,
+                'event_date': now + timedelta(minutes=rng.randint(-60 * 24 * 365 * 2, 60 * 24 * 365)),
+                'venue': rng.choice(VENUES),
+                'category': rng.choice(CATEGORIES + [None]),
+                'user_id': rng.choice(publisher_ids),
+                'department_id': rng.choice(department_ids + [None]),
+            }
+
+        for model, count, make_row in [(Notice, notices, notice_row), (Event, events, event_row)]:
+            for start in range(0, count, batch_size):
+                rows = [make_row() for _ in range(min(batch_size, count - start))]
+                db.session.execute(db.insert(model), rows)
+                db.session.commit()
+
+        return {
+            'departments': len(department_ids),
+            'users': len(roles),
+            'notices': notices,
+            'events': events,
+            'admin': 'admin0',
+            'publisher': 'publisher1',
+            'student': f'student{users - 1}',
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Seed a SQLite database with deterministic benchmark data.')
+    parser.add_argument('db_path', help='SQLite file to create (must not exist yet)')
+    parser.add_argument('--notices', type=int, default=100_000)
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if os.path.exists(args.db_path):
+        parser.error(f'{args.db_path} already exists')
+    counts = seed(make_app(args.db_path), notices=args.notices, events=args.events, users=args.users, seed_value=args.seed)
+    print(counts)
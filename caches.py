@@ -0,0 +1,336 @@
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+
+# In-Process Caches
+# Each worker process keeps its own copy. Caches are invalidated by SQLAlchemy
+# session events when rows of the models they depend on are written, see on_change().
+
+# Cache Registry
+# name -> cache object with a stats() method, read by the metrics endpoint (see metrics.py)
+registered_caches = {}
+
+def register_cache(name, cache):
+    """Makes a cache's stats() visible in the metrics under name."""
+    registered_caches[name] = cache
+    return cache
+
+# Change Notifications
+# model class -> list of callbacks(ids) run when rows of that model are inserted, updated or deleted
+_change_callbacks = {}
+
+def on_change(model, callback):
+    """Calls callback(ids) whenever rows of model are written through the ORM.
+
+    The callback runs right after the flush (so the rest of the request sees fresh data)
+    and again after the transaction commits or rolls back (so nothing read in between sticks).
+    Registering the same callback twice has no effect (create_app may run more than once).
+    """
+    callbacks = _change_callbacks.setdefault(model, [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+def _notify(changed):
+    for model, ids in changed.items():
+        for callback in _change_callbacks.get(model, []):
+            callback(ids)
+
+def _after_flush(session, flush_context):
+    changed = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        model = type(obj)
+        if model in _change_callbacks:
+            changed.setdefault(model, set()).add(getattr(obj, 'id', None))
+    if changed:
+        pending = session.info.setdefault('cache_changes', {})
+        for model, ids in changed.items():
+            pending.setdefault(model, set()).update(ids)
+        _notify(changed)
+
+def _do_orm_execute(orm_execute_state):
+    # Bulk query.update() / query.delete() don't go through the flush, invalidate everything for those models
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        pending = orm_execute_state.session.info.setdefault('cache_changes', {})
+        for mapper in orm_execute_state.all_mappers:
+            if mapper.class_ in _change_callbacks:
+                pending.setdefault(mapper.class_, set()).add(None) # None means "any row"
+
+def _after_transaction_end(session):
+    changed = session.info.pop('cache_changes', None)
+    if changed:
+        _notify(changed)
+
+def register_cache_listeners():
+    """Hooks the change notifications into every SQLAlchemy session (safe to call more than once)."""
+    if event.contains(Session, 'after_flush', _after_flush):
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'do_orm_execute', _do_orm_execute)
+    event.listen(Session, 'after_commit', _after_transaction_end)
+    event.listen(Session, 'after_rollback', _after_transaction_end)
+
+# Generic Bounded TTL Cache
+class TTLCache:
+    """Thread-safe mapping with a maximum size (least recently used entries are evicted first)
+    and a time-to-live per entry. Keeps hit/miss counters for the metrics.
+    """
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict() # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key) # Mark as recently used
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Stores value under key. ttl overrides the default time-to-live (None uses the default)."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Counters for monitoring, hit_rate is hits / lookups (0.0 before the first lookup)."""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+# Department Catalog Cache
+# Lightweight stand-in for a Department row, has the .id and .name the templates use
+CachedDepartment = namedtuple('CachedDepartment', ['id', 'name'])
+
+class DepartmentCache:
+    """Process-wide cache of all departments, sorted by name.
+
+    Serves the department dropdowns and the department filter existence check without a query.
+    Dropped as soon as a department is written in this process; DEPARTMENT_CACHE_TTL bounds how
+    long another worker process keeps offering (and validating against) its outdated list.
+    """
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._departments = None # List of CachedDepartment, None until loaded
+        self._by_id = {}
+        self._expires_at = None # time.monotonic() deadline, None without a TTL
+        self._generation = 0 # Bumped on invalidate, so a load that raced an invalidation isn't kept
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    def configure(self, ttl):
+        self.ttl = ttl
+
+    def _load(self):
+        with self._lock:
+            if self._departments is not None and self._expires_at is not None and self._expires_at <= time.monotonic():
+                self._departments, self._by_id = None, {}
+                self.expirations += 1
+            if self._departments is not None:
+                self.hits += 1
+                return self._departments, self._by_id
+            self.misses += 1
+            generation = self._generation
+        from models import Department
+        rows = db.session.query(Department.id, Department.name).order_by(Department.name).all()
+        departments = [CachedDepartment(row.id, row.name) for row in rows]
+        by_id = {dept.id: dept for dept in departments}
+        with self._lock:
+            if generation == self._generation:
+                self._departments, self._by_id = departments, by_id
+                self._expires_at = time.monotonic() + self.ttl if self.ttl else None
+        return departments, by_id
+
+    def all(self):
+        """All departments ordered by name."""
+        return self._load()[0]
+
+    def get(self, department_id):
+        """The department with this id, or None if it doesn't exist."""
+        return self._load()[1].get(department_id)
+
+    def choices(self):
+        """(id, name) tuples for a SelectField."""
+        return [(dept.id, dept.name) for dept in self.all()]
+
+    def invalidate(self, ids=None):
+        with self._lock:
+            self._departments = None
+            self._by_id = {}
+            self._generation += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._departments or []),
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+department_cache = register_cache('departments', DepartmentCache())
+
+# Logged-In User Cache
+class UserCache:
+    """Identity cache behind the Flask-Login user_loader.
+
+    Keeps a detached, fully loaded copy of each recently seen User for up to USER_CACHE_TTL
+    seconds, so most requests don't query the user table. Entries are dropped as soon as
+    the user row is written (role, password, department, ...) in this process; the TTL
+    bounds how long another worker process can serve an outdated copy.
+    """
+    def __init__(self, max_size=1024, ttl=60.0):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0 # Bumped on invalidate, so a load that raced an invalidation isn't kept
+
+    def configure(self, max_size, ttl):
+        self._cache.max_size = max_size
+        self._cache.ttl = ttl
+
+    def load(self, user_id):
+        """Returns the User with this id attached to the current session, or None."""
+        from models import User
+        cached = self._cache.get(user_id)
+        if cached is not None:
+            # load=False copies the cached state into the session without a SELECT,
+            # the returned instance can still lazy-load relationships as usual
+            return db.session.merge(cached, load=False)
+
+        generation = self._generation
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        # Keep a detached copy for the cache and hand the request its own attached copy
+        db.session.expunge(user)
+        with self._lock:
+            if generation == self._generation:
+                self._cache.set(user_id, user)
+        return db.session.merge(user, load=False)
+
+    def invalidate(self, ids=None):
+        """Drops the given user ids (all users if ids is None or contains None)."""
+        with self._lock:
+            self._generation += 1
+            if ids is None or None in ids:
+                self._cache.clear()
+            else:
+                for user_id in ids:
+                    self._cache.pop(user_id)
+
+    def stats(self):
+        return self._cache.stats()
+
+user_cache = register_cache('users', UserCache())
+
+# Notice/Event Data Version
+class DataVersion:
+    """Counter bumped whenever a Notice or Event is written in this process.
+
+    Caches of derived notice/event data use it as part of their keys: after a write,
+    entries stored under the old version are simply never read again.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def bump(self, ids=None):
+        with self._lock:
+            self.value += 1
+
+data_version = DataVersion()
+
+# Dashboard Fragment Cache
+class DashboardCache:
+    """Rendered "Recent Notices" and "Upcoming Events" cards of the dashboard.
+
+    The cards are the same for every logged-in user, so they are rendered once per data version.
+    Each entry also expires when the first upcoming event it lists starts (it has to drop off the
+    list then), and after DASHBOARD_CACHE_TTL seconds at the latest, which bounds how long
+    another worker process can serve cards from before a write.
+    """
+    def __init__(self, ttl=60.0):
+        self._cache = TTLCache(max_size=4, ttl=ttl)
+
+    def configure(self, ttl):
+        self._cache.ttl = ttl
+
+    def get(self, version):
+        """The cached cards HTML for this data version, or None."""
+        return self._cache.get(version)
+
+    def set(self, version, html, expires_in=None):
+        """Stores the cards rendered from data version. expires_in (seconds) shortens the TTL."""
+        ttl = self._cache.ttl
+        if expires_in is not None:
+            if expires_in <= 0:
+                return # Already outdated
+            ttl = min(ttl, expires_in) if ttl else expires_in
+        self._cache.set(version, html, ttl=ttl)
+
+    def invalidate(self, ids=None):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+dashboard_cache = register_cache('dashboard', DashboardCache())
+
+def init_caches(app):
+    """Configures the caches and connects them to the change notifications. Called from create_app."""
+    from models import Department, User, Notice, Event
+    register_cache_listeners()
+    user_cache.configure(
+        max_size=app.config.get('USER_CACHE_MAX_SIZE', 1024),
+        ttl=app.config.get('USER_CACHE_TTL', 60)
+    )
+    dashboard_cache.configure(ttl=app.config.get('DASHBOARD_CACHE_TTL', 60))
+    department_cache.configure(ttl=app.config.get('DEPARTMENT_CACHE_TTL', 60))
+    on_change(Department, department_cache.invalidate)
+    on_change(User, user_cache.invalidate)
+    for model in (Notice, Event):
+        on_change(model, data_version.bump)
+        on_change(model, dashboard_cache.invalidate)
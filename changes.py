@@ -0,0 +1,119 @@
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import aliased
+from app import db
+from media_jobs import utcnow
+
+# Delta Sync
+# Signage screens and the mobile app used to download the whole notice/event lists on every poll.
+# Now they keep a cursor: /api/v1/changes?since=<cursor> returns only the rows changed after it
+# (deleted ones as tombstones) and the cursor for the next poll, read from the change_log table
+# that SQLite triggers fill on every insert, update and delete of a notice, event or attachment.
+# `flask compact-change-log` (run daily from cron) keeps the table bounded: superseded changes of the
+# same row are dropped, changes older than CHANGE_LOG_RETENTION_DAYS removed. Clients whose cursor
+# is older than that get 410 Gone and download the lists again.
+
+# Trigger actions as reported by the API
+ACTIONS = {'insert': 'created', 'update': 'updated', 'delete': 'deleted'}
+
+def latest_change_id():
+    """Cursor of the newest change, 0 if there are none (primary key lookup)."""
+    from models import ChangeLog
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+def compaction_horizon():
+    """Highest change id removed by compaction, cursors below it have missed changes."""
+    from models import ChangeLogCompaction
+    return db.session.query(func.max(ChangeLogCompaction.compacted_through)).scalar() or 0
+
+def changes_since(since, limit):
+    """Changes after the cursor since, at most limit change rows.
+
+    Returns (changes, cursor, has_more). changes holds the newest ChangeLog row per changed
+    notice/event/attachment in the order of their last change, cursor is the id to poll with next.
+    """
+    from models import ChangeLog
+    rows = db.session.execute(
+        select(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.action)
+        .where(ChangeLog.id > since)
+        .order_by(ChangeLog.id) # Primary key range scan, O(changes) whatever the size of the tables
+        .limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        # A row changed several times is reported once, with its last change
+        latest.pop((row.entity, row.entity_id), None)
+        latest[(row.entity, row.entity_id)] = row
+    return list(latest.values()), (rows[-1].id if rows else since), has_more
+
+def expire_changes(cutoff, batch_size, log=None):
+    """Removes the changes made before cutoff in batches. Returns the number of rows removed."""
+    from models import ChangeLog, ChangeLogCompaction
+    # Ids grow with changed_at: the first recent change bounds the expired ones (walks the primary key)
+    first_kept = db.session.query(ChangeLog.id).filter(ChangeLog.changed_at >= cutoff).order_by(ChangeLog.id).limit(1).scalar()
+    query = db.session.query(func.max(ChangeLog.id))
+    through = (query.filter(ChangeLog.id < first_kept) if first_kept is not None else query).scalar()
+    if through is None:
+        return 0
+    # Recorded before anything is removed, so a run that stops half way still turns old cursors away
+    compaction = ChangeLogCompaction(compacted_through=through)
+    db.session.add(compaction)
+    db.session.commit()
+    removed = 0
+    while True:
+        ids = select(ChangeLog.id).where(ChangeLog.id <= through).order_by(ChangeLog.id).limit(batch_size).scalar_subquery()
+        deleted = db.session.execute(delete(ChangeLog).where(ChangeLog.id.in_(ids)), execution_options={'synchronize_session': False}).rowcount
+        db.session.commit()
+        if not deleted:
+            break
+        removed += deleted
+        if log:
+            log(f'Removed {removed} expired changes so far.')
+    compaction.removed = removed
+    db.session.commit()
+    return removed
+
+def collapse_changes(batch_size, log=None):
+    """Removes changes followed by a newer change of the same row, in batches of ids.
+
+    Clients only need the last change of a row, whatever their cursor. Returns the number of rows removed.
+    """
+    from models import ChangeLog
+    newer = aliased(ChangeLog)
+    low, high = db.session.query(func.min(ChangeLog.id), func.max(ChangeLog.id)).one()
+    if low is None:
+        return 0
+    removed = 0
+    for start in range(low, high + 1, batch_size):
+        superseded = select(ChangeLog.id).where(
+            ChangeLog.id >= start, ChangeLog.id < start + batch_size,
+            # Index lookup on (entity, entity_id, id)
+            select(newer.id).where(newer.entity == ChangeLog.entity, newer.entity_id == ChangeLog.entity_id, newer.id > ChangeLog.id).exists()
+        ).scalar_subquery()
+        removed += db.session.execute(delete(ChangeLog).where(ChangeLog.id.in_(superseded)), execution_options={'synchronize_session': False}).rowcount
+        db.session.commit()
+    if log:
+        log(f'Removed {removed} superseded changes.')
+    return removed
+
+def compact_change_log(cutoff, batch_size=1000, log=None):
+    """Expires the changes before cutoff, then collapses the rest. Returns (expired, collapsed)."""
+    expired = expire_changes(cutoff, batch_size, log=log)
+    return expired, collapse_changes(batch_size, log=log)
+
+def change_log_cutoff(days=None, now=None):
+    """Changes before this time are removed by compaction, days defaults to CHANGE_LOG_RETENTION_DAYS.
+
+    Naive UTC like changed_at (SQLite CURRENT_TIMESTAMP), whatever the server's time zone.
+    """
+    if days is None:
+        days = current_app.config['CHANGE_LOG_RETENTION_DAYS']
+    return (now or utcnow()) - timedelta(days=days)
+
+def init_changes(app):
+    """Change log settings defaults. Called from create_app."""
+    app.config.setdefault('CHANGE_LOG_RETENTION_DAYS', 30)
+    app.config.setdefault('CHANGE_LOG_BATCH_SIZE', 1000)
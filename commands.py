@@ -0,0 +1,278 @@
+import re
+import click
+from itertools import product
+from datetime import datetime
+from flask import current_app
+from flask.cli import with_appcontext
+from app import db
+
+# Custom Flask CLI Commands
+# Registered on the app in create_app via register_commands(app)
+
+# A plan row like "SCAN notice" (or "SCAN TABLE notice" on older SQLite) means a full table scan.
+# "SCAN notice USING INDEX ..." walks an index in sort order and is fine.
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (?:TABLE )?(notice|event|event_archive)\b(?!.*\bUSING\b)')
+
+def explain_query_plan(query):
+    """Returns the detail column of EXPLAIN QUERY PLAN for a query (SQLite only)."""
+    # Inline the bound values so the statement can be prefixed with EXPLAIN QUERY PLAN
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+    rows = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)).all()
+    return [row[-1] for row in rows]
+
+def list_query_shapes():
+    """Yields (label, query, allow_full_scan) for every query shape the list and dashboard pages run."""
+    from queries import Cursor, build_notice_query, build_event_query, recent_notices_query, upcoming_events_query, notice_facet_query, event_facet_query
+
+    # Any non-null value produces the same plan, only the shape of the filter matters
+    date_ranges = [(None, None), (datetime(2025, 1, 1), None), (None, datetime(2025, 12, 31)), (datetime(2025, 1, 1), datetime(2025, 12, 31))]
+    sort_orders = ['asc', 'desc']
+    # First page, "next page" and "previous page" keyset positions
+    sort_values = {'date': datetime(2025, 6, 1), 'title': 'M', 'department': 'M', 'category': 'M'}
+    directions = [None, False, True]
+
+    for department_id, (start_date, end_date), sort_by, sort_order, backwards in product([None, 1], date_ranges, ['date', 'title', 'department'], sort_orders, directions):
+        cursor = Cursor(sort_values[sort_by], 1, backwards) if backwards is not None else None
+        query, _, _ = build_notice_query(department_id=department_id, start_date=start_date, end_date=end_date, sort_by=sort_by, sort_order=sort_order, cursor=cursor)
+        label = f'notice_list department_id={department_id} start_date={start_date} end_date={end_date} sort={sort_by} {sort_order} cursor={cursor}'
+        # Sorting the whole table by the joined department name has to visit every row
+        unfiltered = department_id is None and start_date is None and end_date is None
+        yield label, query.limit(10), unfiltered and sort_by == 'department'
+
+    for department_id, category, (start_date, end_date), sort_by, sort_order, backwards in product([None, 1], [None, 'Academic'], date_ranges, ['date', 'title', 'category', 'department'], sort_orders, directions):
+        cursor = Cursor(sort_values[sort_by], 1, backwards) if backwards is not None else None
+        # With a date filter, the list may read the archive too (see archive.archive_reaches)
+        for include_archive in ([False, True] if start_date or end_date else [False]):
+            query, _, _ = build_event_query(department_id=department_id, start_date=start_date, end_date=end_date, category=category, sort_by=sort_by, sort_order=sort_order, cursor=cursor, include_archive=include_archive)
+            label = f'event_list department_id={department_id} category={category} start_date={start_date} end_date={end_date} sort={sort_by} {sort_order} cursor={cursor} archive={include_archive}'
+            unfiltered = department_id is None and category is None and start_date is None and end_date is None
+            yield label, query.limit(10), unfiltered and sort_by == 'department'
+
+    # Filter panel counts (see facets.py), one GROUP BY per date range
+    for start_date, end_date in date_ranges:
+        yield f'notice_facets start_date={start_date} end_date={end_date}', notice_facet_query(start_date, end_date), False
+        for include_archive in ([False, True] if start_date or end_date else [False]):
+            yield f'event_facets start_date={start_date} end_date={end_date} archive={include_archive}', event_facet_query(start_date, end_date, include_archive), False
+
+    yield 'index recent_notices', recent_notices_query(5), False
+    yield 'index upcoming_events', upcoming_events_query(5), False
+
+@click.command('check-query-plans')
+@click.option('--verbose', '-v', is_flag=True, help='Print the plan of every query shape.')
+@with_appcontext
+def check_query_plans_command(verbose):
+    """Fails if any list query shape falls back to a full table scan."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('check-query-plans only understands SQLite query plans.')
+
+    failures = []
+    checked = 0
+    for label, query, allow_full_scan in list_query_shapes():
+        plan = explain_query_plan(query)
+        checked += 1
+        full_scans = [detail for detail in plan if FULL_SCAN_PATTERN.match(detail)]
+        if verbose:
+            click.echo(f'{label}\n    ' + '\n    '.join(plan))
+        if full_scans and not allow_full_scan:
+            failures.append((label, plan))
+
+    for label, plan in failures:
+        click.echo(f'FULL SCAN: {label}', err=True)
+        for detail in plan:
+            click.echo(f'    {detail}', err=True)
+
+    if failures:
+        raise click.ClickException(f'{len(failures)} of {checked} query shapes fall back to a full table scan. Did you run `flask db upgrade`?')
+    click.echo(f'All {checked} query shapes use an index.')
+
+# Most SQL statements a page may issue when rendered with cold caches (user loader included).
+# The counts must not grow with the number of rows on the page, a lazy load per row (N+1) breaks them.
+PAGE_STATEMENT_LIMITS = {
+    'index': 3,
+    'notice_list': 5,
+    'event_list': 5,
+    'notice_detail': 4,
+    'event_detail': 4,
+}
+
+def clear_registered_caches():
+    from caches import registered_caches
+    for cache in registered_caches.values():
+        if hasattr(cache, 'invalidate'):
+            cache.invalidate()
+        elif hasattr(cache, 'clear'):
+            cache.clear()
+
+@click.command('check-statement-counts')
+@click.option('--verbose', '-v', is_flag=True, help='Print the statements of every page.')
+@with_appcontext
+def check_statement_counts_command(verbose):
+    """Renders the main pages and fails if one issues more SQL statements than its limit."""
+    from flask import url_for
+    from sqlalchemy import event
+    from models import User, Notice, Event
+
+    notice_id = db.session.query(Notice.id).order_by(Notice.id.desc()).limit(1).scalar()
+    event_id = db.session.query(Event.id).order_by(Event.id.desc()).limit(1).scalar()
+    user = User.query.filter_by(role='admin').first() or User.query.first()
+    if notice_id is None or event_id is None or user is None:
+        raise click.ClickException('check-statement-counts needs at least one user, notice and event in the database.')
+    with current_app.test_request_context():
+        pages = {
+            'index': url_for('main.index'),
+            'notice_list': url_for('notice.notice_list'),
+            'event_list': url_for('event.event_list'),
+            'notice_detail': url_for('notice.notice_detail', notice_id=notice_id),
+            'event_detail': url_for('event.event_detail', event_id=event_id),
+        }
+
+    statements = []
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = current_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id) # Logged in as this user (Flask-Login session keys)
+        session['_fresh'] = True
+    engines = list(db.engines.values()) # The primary and the read replica (see db_routing.py)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', count_statement)
+    failures = []
+    try:
+        for name, url in pages.items():
+            clear_registered_caches() # Every page is measured with cold caches
+            statements.clear()
+            # A fresh app context per page: requests would otherwise share the command's session
+            # (identity map) and g (the logged-in user) and hide the statements of a cold request
+            with current_app.app_context():
+                response = client.get(url)
+            if response.status_code != 200:
+                raise click.ClickException(f'{name} ({url}) answered {response.status_code}.')
+            limit = PAGE_STATEMENT_LIMITS[name]
+            click.echo(f'{name}: {len(statements)} statements (limit {limit})')
+            if verbose:
+                for statement in statements:
+                    click.echo('    ' + ' '.join(statement.split())[:200])
+            if len(statements) > limit:
+                failures.append(name)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', count_statement)
+    if failures:
+        raise click.ClickException(f'Over the statement limit: {", ".join(failures)}. A relationship is probably lazy loaded per row (N+1).')
+    click.echo(f'All {len(pages)} pages are within their statement limits.')
+
+@click.command('backfill-rendered-content')
+@click.option('--all', 'render_all', is_flag=True, help='Re-render every row, not just rows without rendered HTML.')
+@click.option('--batch-size', default=500, show_default=True, help='Rows rendered per transaction.')
+@with_appcontext
+def backfill_rendered_content_command(render_all, batch_size):
+    """Stores rendered Markdown HTML and excerpts for existing notices and events."""
+    from models import Notice, Event, render_markdown
+
+    for model, source_column in [(Notice, Notice.content), (Event, Event.description)]:
+        updated = 0
+        last_id = 0
+        while True:
+            # Walk the table by id in batches so each transaction stays small
+            query = db.session.query(model.id, source_column).filter(model.id > last_id)
+            if not render_all:
+                query = query.filter(model.content_html.is_(None))
+            rows = query.order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row_id, text in rows:
+                html, excerpt = render_markdown(text)
+                db.session.query(model).filter(model.id == row_id).update(
+                    # Setting last_edited_timestamp to itself keeps its onupdate from firing, a backfill isn't an edit
+                    {model.content_html: html, model.excerpt: excerpt, model.last_edited_timestamp: model.last_edited_timestamp},
+                    synchronize_session=False
+                )
+            db.session.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+        click.echo(f'{model.__tablename__}: rendered {updated} rows.')
+
+@click.command('check-sqlite-profile')
+@with_appcontext
+def check_sqlite_profile_command():
+    """Prints the PRAGMAs of the production engine profile as a pooled connection sees them."""
+    from engine_profile import sqlite_settings
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('check-sqlite-profile only applies to SQLite databases.')
+    with db.engine.connect() as connection:
+        settings = sqlite_settings(connection)
+    for name, value in settings.items():
+        click.echo(f'{name} = {value}')
+    click.echo(f'pool: {db.engine.pool.status()}')
+    if current_app.config.get('SQLITE_PRAGMAS') != {} and str(settings['journal_mode']).lower() != 'wal':
+        raise click.ClickException('The database is not in WAL mode.')
+
+@click.command('gc-media')
+@click.option('--grace-minutes', default=60, show_default=True, help='Keep files changed this recently (uploads still in progress).')
+@with_appcontext
+def gc_media_command(grace_minutes):
+    """Removes stored media files that no attachment refers to any more."""
+    from media import collect_garbage
+    removed, freed = collect_garbage(grace_seconds=grace_minutes * 60)
+    click.echo(f'Removed {removed} unused files ({freed} bytes).')
+
+@click.command('media-worker')
+@click.option('--processes', default=2, show_default=True, help='Rendering processes.')
+@click.option('--poll-interval', default=2.0, show_default=True, help='Seconds between checks for new jobs.')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty instead of waiting for new jobs.')
+@with_appcontext
+def media_worker_command(processes, poll_interval, once):
+    """Renders thumbnails and previews of attachments queued by uploads."""
+    from media_jobs import run_worker
+    click.echo(f'Media worker started with {processes} processes.')
+    try:
+        run_worker(processes=processes, poll_interval=poll_interval, once=once, log=click.echo)
+    except KeyboardInterrupt:
+        click.echo('Stopped, unfinished jobs were put back in the queue.')
+
+@click.command('archive-events')
+@click.option('--older-than-days', type=int, default=None, help='Archive events before this many days ago [default: EVENT_ARCHIVE_AFTER_DAYS].')
+@click.option('--batch-size', type=int, default=None, help='Events moved per transaction [default: EVENT_ARCHIVE_BATCH_SIZE].')
+@with_appcontext
+def archive_events_command(older_than_days, batch_size):
+    """Moves past events and their attachments to the archive tables (run daily)."""
+    from datetime import timedelta
+    from archive import archive_cutoff, archive_events
+    cutoff = archive_cutoff() if older_than_days is None else datetime.now() - timedelta(days=older_than_days)
+    batch_size = batch_size or current_app.config['EVENT_ARCHIVE_BATCH_SIZE']
+    events, attachments = archive_events(cutoff, batch_size=batch_size, log=click.echo)
+    click.echo(f'Archived {events} events before {cutoff:%Y-%m-%d} with {attachments} attachments.')
+
+@click.command('compact-change-log')
+@click.option('--older-than-days', type=int, default=None, help='Remove changes made before this many days ago [default: CHANGE_LOG_RETENTION_DAYS].')
+@click.option('--batch-size', type=int, default=None, help='Changes removed per transaction [default: CHANGE_LOG_BATCH_SIZE].')
+@with_appcontext
+def compact_change_log_command(older_than_days, batch_size):
+    """Removes old and superseded rows of the delta sync change log (run daily)."""
+    from changes import change_log_cutoff, compact_change_log
+    cutoff = change_log_cutoff(older_than_days)
+    batch_size = batch_size or current_app.config['CHANGE_LOG_BATCH_SIZE']
+    expired, collapsed = compact_change_log(cutoff, batch_size=batch_size, log=click.echo)
+    click.echo(f'Removed {expired} changes before {cutoff:%Y-%m-%d %H:%M} UTC and {collapsed} superseded changes.')
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Writes content-hashed copies of the static CSS/JS/SVG files with gzip and brotli variants."""
+    from assets import build_assets, dist_root
+    manifest = build_assets(current_app)
+    click.echo(f'Built {len(manifest)} assets in {dist_root()}.')
+    click.echo('Restart the server processes so they load the new manifest.')
+
+def register_commands(app):
+    """Registers the custom CLI commands with the app."""
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(check_statement_counts_command)
+    app.cli.add_command(backfill_rendered_content_command)
+    app.cli.add_command(check_sqlite_profile_command)
+    app.cli.add_command(gc_media_command)
+    app.cli.add_command(media_worker_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(archive_events_command)
+    app.cli.add_command(compact_change_log_command)
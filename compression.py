@@ -0,0 +1,163 @@
+import zlib
+import brotli
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header, parse_cache_control_header
+
+# Response Compression
+# WSGI middleware around the Flask app (see init_compression) that compresses text responses with
+# brotli or gzip, whichever the browser accepts. Streamed responses (NDJSON exports, calendar feeds)
+# are compressed chunk by chunk: every chunk is flushed, so the browser gets data as soon as the app
+# yields it instead of after the whole response was buffered.
+# Skipped: small bodies, responses that are compressed already (precompressed assets, images, PDFs),
+# range-capable file downloads (ranges refer to the uncompressed bytes) and event streams.
+
+# Content types worth compressing (without parameters like charset)
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/calendar', 'text/javascript',
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'application/atom+xml', 'application/rss+xml', 'image/svg+xml',
+}
+# Accept-Encoding tokens we can produce, preferred first when the browser rates them the same
+ENCODINGS = ('br', 'gzip')
+# No compression for these statuses: no body, or a byte range of the uncompressed body
+SKIPPED_STATUSES = {204, 206, 304}
+
+class GzipStream:
+    """gzip stream whose compress() returns everything up to the end of the chunk."""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # 16+: gzip header
+
+    def compress(self, chunk):
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+class BrotliStream:
+    """Brotli stream with the same interface as GzipStream."""
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+def negotiate_encoding(accept_encoding):
+    """The encoding to use for an Accept-Encoding header, or None for no compression."""
+    if not accept_encoding:
+        return None
+    accepted = parse_accept_header(accept_encoding)
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accepted.quality(encoding) # Also matches '*'
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def weak_etag(etag):
+    # The compressed bytes differ from the uncompressed ones, a strong ETag would promise they don't.
+    # Weak ETags still answer If-None-Match (werkzeug compares them weakly).
+    if etag and not etag.startswith('W/'):
+        return 'W/' + etag
+    return etag
+
+class CompressionMiddleware:
+    """Compresses the responses of a WSGI app, see the module comment."""
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def make_stream(self, encoding):
+        if encoding == 'br':
+            return BrotliStream(self.brotli_quality)
+        return GzipStream(self.gzip_level)
+
+    def should_compress(self, status_code, headers):
+        if status_code < 200 or status_code in SKIPPED_STATUSES:
+            return False
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        # send_file responses (attachment downloads) serve byte ranges of the stored file
+        if 'Accept-Ranges' in headers:
+            return False
+        if 'no-transform' in parse_cache_control_header(headers.get('Cache-Control')):
+            return False
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return False
+        # Streamed responses have no Content-Length, they are compressed whatever their size
+        content_length = headers.get('Content-Length', type=int)
+        return content_length is None or content_length >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        state = {'started': False, 'stream': None}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            status_code = int(status.split(' ', 1)[0])
+            compress = self.should_compress(status_code, headers)
+            if compress or status_code == 304:
+                # Caches must keep the compressed and the plain version apart (304s repeat the 200's headers)
+                vary = [value.strip() for value in headers.get('Vary', '').split(',') if value.strip()]
+                if 'accept-encoding' not in (value.lower() for value in vary) and '*' not in vary:
+                    headers['Vary'] = ', '.join(vary + ['Accept-Encoding'])
+                if 'ETag' in headers:
+                    headers['ETag'] = weak_etag(headers['ETag'])
+            if compress:
+                headers['Content-Encoding'] = encoding
+                headers.remove('Content-Length') # Not known until the last chunk is compressed
+                if environ.get('REQUEST_METHOD') != 'HEAD':
+                    state['stream'] = self.make_stream(encoding)
+            state['started'] = True
+            write = start_response(status, headers.to_wsgi_list(), exc_info)
+            stream = state['stream']
+            if stream is None:
+                return write
+            return lambda data: write(stream.compress(data))
+
+        body = self.app(environ, compressing_start_response)
+        if state['started'] and state['stream'] is None:
+            return body # Unchanged, keeps wsgi.file_wrapper (sendfile) for file downloads
+        return self._compressed(body, state)
+
+    def _compressed(self, body, state):
+        try:
+            for chunk in body:
+                stream = state['stream'] # start_response may be called on the first iteration
+                if stream is None:
+                    yield chunk
+                    continue
+                data = stream.compress(chunk)
+                if data:
+                    yield data
+            if state['stream'] is not None:
+                yield state['stream'].finish()
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+def init_compression(app):
+    """Wraps the app in the compression middleware. Called from create_app."""
+    app.config.setdefault('COMPRESSION_ENABLED', True)
+    app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 4)
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config['COMPRESSION_MIN_SIZE'],
+        gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+        brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY'],
+    )
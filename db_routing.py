@@ -0,0 +1,69 @@
+import time
+from flask import g, request, session, has_request_context, current_app
+from flask_sqlalchemy.session import Session
+
+# Read/Write Routing
+# With READ_REPLICA_URI set, SELECTs of GET/HEAD requests run on a separate read-only engine
+# (a replica file, or the primary file opened a second time with mode=ro), everything else on the
+# primary. A request that writes is pinned to the primary from then on, and so are the same
+# browser's next requests for READ_REPLICA_PIN_SECONDS, so a redirect after a POST shows the write
+# even when the replica is a little behind.
+
+# Bind key of the read-only engine in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+# Methods whose requests may read from the replica
+READ_METHODS = {'GET', 'HEAD'}
+# Flask session key holding the time until which this browser reads from the primary
+PIN_SESSION_KEY = '_db_primary_until'
+
+def configure_read_replica(app):
+    """Adds the replica engine to SQLALCHEMY_BINDS. Called from create_app before db.init_app."""
+    app.config.setdefault('READ_REPLICA_PIN_SECONDS', 5)
+    uri = app.config.get('READ_REPLICA_URI')
+    if not uri:
+        return
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    # Bind engines don't get SQLALCHEMY_ENGINE_OPTIONS by themselves
+    binds[REPLICA_BIND] = {**(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}), 'url': uri}
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+def _reads_from_replica(db_session):
+    if db_session.info.get('pinned_to_primary') or not has_request_context():
+        return False # CLI commands and background work always use the primary
+    if request.method not in READ_METHODS:
+        return False
+    return session.get(PIN_SESSION_KEY, 0) <= time.time()
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends reads of read-only requests to the replica engine."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return engine
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.pin_to_primary()
+            return engine
+        engines = self._db.engines
+        if REPLICA_BIND in engines and engine is engines.get(None) and _reads_from_replica(self):
+            return engines[REPLICA_BIND]
+        return engine
+
+    def pin_to_primary(self):
+        """Sends the rest of this request, and the browser's next few requests, to the primary."""
+        if self.info.get('pinned_to_primary'):
+            return
+        self.info['pinned_to_primary'] = True
+        if has_request_context():
+            g.db_wrote = True
+
+def init_read_routing(app):
+    """Keeps a browser on the primary for a moment after it wrote. Called from create_app."""
+    if not app.config.get('READ_REPLICA_URI'):
+        return
+
+    @app.after_request
+    def pin_browser_to_primary(response):
+        if g.get('db_wrote'):
+            session[PIN_SESSION_KEY] = time.time() + current_app.config['READ_REPLICA_PIN_SECONDS']
+        return response
@@ -0,0 +1,67 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Production SQLite Engine Profile
+# With several worker processes/threads, SQLite's defaults (rollback journal, full fsync on every
+# commit, no waiting on locks) make readers block writers and fail with "database is locked".
+# The profile switches the database to WAL (readers never block the writer and vice versa), makes
+# locked connections wait instead of failing, and sizes the connection pool.
+
+# PRAGMAs run on every new connection, in this order (override with SQLITE_PRAGMAS, {} disables)
+DEFAULT_SQLITE_PRAGMAS = {
+    'busy_timeout': 5000, # ms to wait for a lock before "database is locked" (first, so switching to WAL waits too)
+    'journal_mode': 'WAL', # Stored in the database file, readers see the last commit while a write runs
+    'synchronous': 'NORMAL', # fsync at checkpoints instead of every commit, still safe in WAL mode
+    'mmap_size': 256 * 1024 * 1024, # Read pages through a memory map (bytes)
+    'cache_size': -16000, # Page cache per connection, negative means KiB (~16 MB)
+    'temp_store': 'MEMORY', # Sorts and temporary indexes in memory
+}
+
+# Pool defaults for SQLite files, SQLALCHEMY_ENGINE_OPTIONS in the config takes precedence
+DEFAULT_SQLITE_ENGINE_OPTIONS = {
+    'pool_size': 10, # Connections kept open per worker process (one per server thread)
+    'max_overflow': 10, # Extra connections under bursts, closed again when returned
+    'pool_timeout': 10, # Seconds to wait for a free connection
+}
+
+def is_sqlite_file(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def configure_engine_options(app):
+    """Fills in the pool defaults for a SQLite file. Called from create_app before db.init_app."""
+    if not is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    for key, value in DEFAULT_SQLITE_ENGINE_OPTIONS.items():
+        options.setdefault(key, value)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+def init_engine_profile(app):
+    """Runs the PRAGMAs on every new SQLite connection. Called from create_app after db.init_app."""
+    from app import db
+    pragmas = app.config.get('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    if not pragmas:
+        return
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        engines = list(db.engines.values()) # The primary and the read replica (see db_routing.py)
+    for engine in engines:
+        if engine.dialect.name != 'sqlite':
+            continue
+        # A read-only connection keeps the file's journal mode, the other PRAGMAs apply per connection
+        event.listen(engine, 'connect', apply_pragmas)
+        # Connections opened before the listener (none normally) would miss the PRAGMAs
+        engine.dispose()
+
+def sqlite_settings(connection):
+    """Current values of the profile's PRAGMAs on a connection, e.g. for `flask check-sqlite-profile`."""
+    return {name: connection.exec_driver_sql(f'PRAGMA {name}').scalar() for name in DEFAULT_SQLITE_PRAGMAS}
@@ -0,0 +1,52 @@
+from collections import namedtuple
+from caches import TTLCache, data_version, register_cache
+
+# Facet Counts
+# The filter panels of the notice and event lists show how many items each department and
+# category option would list. All counts of a page come from one GROUP BY over the rows in its
+# date range (queries.notice_facet_query / event_facet_query), not one COUNT per option.
+# The grouped rows are cached per date range and data version: any notice/event write in this
+# process starts a new version, FACET_CACHE_TTL bounds how long other processes' writes take to show.
+#
+# Like in most faceted search UIs, each facet counts the other active filters but not its own,
+# so the department counts answer "how many if I picked this department instead".
+
+FacetCounts = namedtuple('FacetCounts', ['total', 'departments', 'categories'])
+
+facet_cache = register_cache('facets', TTLCache(max_size=256, ttl=60.0))
+
+def _grouped_rows(key, query_factory):
+    key = (data_version.value,) + key
+    rows = facet_cache.get(key)
+    if rows is None:
+        rows = [tuple(row) for row in query_factory()]
+        facet_cache.set(key, rows)
+    return rows
+
+def notice_facets(start_date=None, end_date=None):
+    """FacetCounts of the notice list: {department_id: count} for the date range."""
+    from queries import notice_facet_query
+    rows = _grouped_rows(('notice', start_date, end_date), lambda: notice_facet_query(start_date, end_date))
+    departments = {department_id: count for department_id, count in rows}
+    return FacetCounts(sum(departments.values()), departments, {})
+
+def event_facets(start_date=None, end_date=None, department_id=None, category=None, include_archive=False):
+    """FacetCounts of the event list: department counts within the selected category and
+    category counts within the selected department, for the date range."""
+    from queries import event_facet_query
+    rows = _grouped_rows(('event', start_date, end_date, include_archive),
+                         lambda: event_facet_query(start_date, end_date, include_archive))
+    departments, categories = {}, {}
+    total = 0
+    for row_department_id, row_category, count in rows:
+        if not category or row_category == category:
+            departments[row_department_id] = departments.get(row_department_id, 0) + count
+        if not department_id or row_department_id == department_id:
+            categories[row_category] = categories.get(row_category, 0) + count
+            if not category or row_category == category:
+                total += count
+    return FacetCounts(total, departments, categories)
+
+def init_facets(app):
+    """Configures the facet cache. Called from create_app."""
+    facet_cache.ttl = app.config.get('FACET_CACHE_TTL', 60)
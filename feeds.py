@@ -0,0 +1,203 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+from flask import current_app, url_for
+from itsdangerous import URLSafeSerializer, BadData
+from caches import TTLCache, on_change, register_cache, user_cache
+
+# Feed Helpers
+# Calendar apps and feed readers can't log in, so feed URLs carry a signed per-user key (?key=...).
+# Feed entries are serialized once and kept in an EntryCache until the row changes.
+
+# Feed Keys
+def _feed_key_serializer():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='feed-key')
+
+def make_feed_key(user):
+    """Signed key that lets a feed reader fetch feeds as this user.
+
+    Part of the password hash is signed in, so changing the password revokes old feed URLs.
+    """
+    return _feed_key_serializer().dumps([user.id, (user.password_hash or '')[-8:]])
+
+def load_feed_key(key):
+    """Returns the User a feed key belongs to, or None if the key is invalid or revoked."""
+    try:
+        user_id, password_part = _feed_key_serializer().loads(key)
+    except (BadData, TypeError, ValueError):
+        return None
+    if not isinstance(user_id, int):
+        return None
+    user = user_cache.load(user_id)
+    if user is None or (user.password_hash or '')[-8:] != password_part:
+        return None
+    return user
+
+# Serialized Entry Cache
+class EntryCache:
+    """Serialized feed entries by row id, each stored with the version it was made from.
+
+    An entry is only used while the row still has the same version (e.g. its last edit timestamp),
+    so an edit in any worker process makes the next request serialize that one entry again.
+    Rows written in this process are also dropped right away (see caches.on_change).
+    """
+    def __init__(self, max_size=10000):
+        self._cache = TTLCache(max_size=max_size, ttl=0) # No expiry, entries are checked by version
+
+    def get(self, row_id, version):
+        entry = self._cache.get(row_id)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def set(self, row_id, version, text):
+        self._cache.set(row_id, (version, text))
+
+    def invalidate(self, ids=None):
+        if ids is None or None in ids:
+            self._cache.clear()
+        else:
+            for row_id in ids:
+                self._cache.pop(row_id)
+
+    def stats(self):
+        return self._cache.stats()
+
+# iCalendar (RFC 5545)
+ICS_HEADER = (
+    'BEGIN:VCALENDAR\r\n'
+    'VERSION:2.0\r\n'
+    'PRODID:-//College Portal//Events//EN\r\n'
+    'CALSCALE:GREGORIAN\r\n'
+    'METHOD:PUBLISH\r\n'
+)
+ICS_FOOTER = 'END:VCALENDAR\r\n'
+# Events only have a start time, calendar apps show them with this duration
+EVENT_DURATION = 'PT1H'
+
+def ics_escape(text):
+    """Escapes a TEXT value (backslash, semicolon, comma and newlines)."""
+    return (text or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+
+def ics_line(name, value):
+    """One content line, folded at 75 octets as the RFC requires (continuation lines start with a space)."""
+    line = f'{name}:{value}'.encode('utf-8')
+    parts = []
+    while len(line) > 75:
+        cut = 75 if not parts else 74 # Continuation lines lose one octet to the leading space
+        # Don't split a multi-byte UTF-8 character
+        while cut > 0 and (line[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(line[:cut])
+        line = line[cut:]
+    parts.append(line)
+    return '\r\n '.join(part.decode('utf-8') for part in parts) + '\r\n'
+
+def ics_utc(value):
+    """Stored timestamps are naive UTC."""
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+def event_to_vevent(row):
+    """Serializes an event row (see routes.feeds.EVENT_FEED_COLUMNS) to a VEVENT block."""
+    # Event dates are entered as local wall-clock time, so they are written as floating times (no Z)
+    stamp = row.last_edited_timestamp or datetime.now(timezone.utc).replace(tzinfo=None)
+    lines = [
+        'BEGIN:VEVENT\r\n',
+        ics_line('UID', f'event-{row.id}@college-portal'),
+        ics_line('DTSTAMP', ics_utc(stamp)),
+        ics_line('DTSTART', row.event_date.strftime('%Y%m%dT%H%M%S')),
+        ics_line('DURATION', EVENT_DURATION),
+        ics_line('SUMMARY', ics_escape(row.title)),
+        ics_line('LOCATION', ics_escape(row.venue)),
+        ics_line('DESCRIPTION', ics_escape(row.description)),
+        ics_line('URL', url_for('event.event_detail', event_id=row.id, _external=True)),
+    ]
+    if row.category:
+        lines.append(ics_line('CATEGORIES', ics_escape(row.category)))
+    if row.last_edited_timestamp:
+        lines.append(ics_line('LAST-MODIFIED', ics_utc(row.last_edited_timestamp)))
+    lines.append('END:VEVENT\r\n')
+    return ''.join(lines)
+
+# Atom (RFC 4287) and RSS 2.0
+def atom_date(value):
+    """Stored timestamps are naive UTC."""
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def rss_date(value):
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+def notice_updated(row):
+    return row.last_edited_timestamp or row.issue_date
+
+def notice_to_atom_entry(row, department_name=None):
+    """Serializes a notice row (see routes.feeds.NOTICE_FEED_COLUMNS) to an Atom <entry>."""
+    url = url_for('notice.notice_detail', notice_id=row.id, _external=True)
+    parts = [
+        '<entry>',
+        f'<id>{escape(url)}</id>',
+        f'<title>{escape(row.title)}</title>',
+        f'<link rel="alternate" type="text/html" href={quoteattr(url)}/>',
+        f'<published>{atom_date(row.issue_date)}</published>',
+        f'<updated>{atom_date(notice_updated(row))}</updated>',
+        f'<author><name>{escape(row.publisher)}</name></author>',
+    ]
+    if department_name:
+        parts.append(f'<category term={quoteattr(department_name)}/>')
+    # The HTML was rendered from the Markdown when the notice was saved
+    parts.append(f'<summary>{escape(row.excerpt or "")}</summary>')
+    parts.append(f'<content type="html">{escape(row.content_html or "")}</content>')
+    parts.append('</entry>\n')
+    return ''.join(parts)
+
+def notice_to_rss_item(row, department_name=None):
+    """Serializes a notice row (see routes.feeds.NOTICE_FEED_COLUMNS) to an RSS <item>."""
+    url = url_for('notice.notice_detail', notice_id=row.id, _external=True)
+    parts = [
+        '<item>',
+        f'<title>{escape(row.title)}</title>',
+        f'<link>{escape(url)}</link>',
+        f'<guid isPermaLink="true">{escape(url)}</guid>',
+        f'<pubDate>{rss_date(row.issue_date)}</pubDate>',
+    ]
+    if department_name:
+        parts.append(f'<category>{escape(department_name)}</category>')
+    parts.append(f'<description>{escape(row.content_html or "")}</description>')
+    parts.append('</item>\n')
+    return ''.join(parts)
+
+def atom_document(title, feed_url, site_url, updated, entries):
+    head = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+        f'<id>{escape(feed_url)}</id>\n'
+        f'<title>{escape(title)}</title>\n'
+        f'<updated>{atom_date(updated or datetime.now(timezone.utc).replace(tzinfo=None))}</updated>\n'
+        f'<link rel="alternate" type="text/html" href={quoteattr(site_url)}/>\n'
+    )
+    return head + ''.join(entries) + '</feed>\n'
+
+def rss_document(title, site_url, updated, items):
+    head = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0"><channel>\n'
+        f'<title>{escape(title)}</title>\n'
+        f'<link>{escape(site_url)}</link>\n'
+        f'<description>{escape(title)}</description>\n'
+    )
+    if updated:
+        head += f'<lastBuildDate>{rss_date(updated)}</lastBuildDate>\n'
+    return head + ''.join(items) + '</channel></rss>\n'
+
+vevent_cache = register_cache('feed_vevents', EntryCache())
+atom_entry_cache = register_cache('feed_atom_entries', EntryCache())
+rss_item_cache = register_cache('feed_rss_items', EntryCache())
+
+def init_feeds(app):
+    """Connects the entry caches to the change notifications. Called from create_app."""
+    from models import Notice, Event
+    app.config.setdefault('FEED_PAST_DAYS', 30)
+    on_change(Event, vevent_cache.invalidate)
+    on_change(Notice, atom_entry_cache.invalidate)
+    on_change(Notice, rss_item_cache.invalidate)
@@ -1,9 +1,18 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import MultipleFileField # File uploads (attachments)
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, SelectField, DateTimeField # Add TextAreaField, SelectField # Add DateTimeField
 # Import validators: DataRequired checks if field is not empty, Email checks format.
 from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError # Add EqualTo, ValidationError
-from models import User, Department # Import the User model to check for existing users # Import Department if using department selection
+from models import User # Import the User model to check for existing users
+from caches import department_cache # Cached department catalog for the dropdowns
 from datetime import datetime # Add this import
+from media import is_allowed_filename # Allowed attachment extensions (MEDIA_ALLOWED_EXTENSIONS)
+
+def allowed_attachments(form, field):
+    """Rejects attachments whose file extension isn't in MEDIA_ALLOWED_EXTENSIONS."""
+    for upload in field.data or []:
+        if upload and upload.filename and not is_allowed_filename(upload.filename):
+            raise ValidationError(f'{upload.filename}: this file type can\'t be attached.')
 
 # Define the login form structure and validation rules
 class LoginForm(FlaskForm):
@@ -47,17 +56,18 @@ class NoticeForm(FlaskForm):
     # Optional: Department Selection
     # coerce=int ensures the value submitted is treated as an integer
     department_id = SelectField('Department (Optional)', coerce=int)
+    # Files are streamed to the content-addressed store when the form is saved (see media.py)
+    attachments = MultipleFileField('Attachments (Optional)', validators=[allowed_attachments])
     submit = SubmitField('Post Notice') # Label might change for editing
 
     # --- Populate Department Choices ---
     # We need to populate the choices for the department dropdown dynamically
     def __init__(self, *args, **kwargs):
         super(NoticeForm, self).__init__(*args, **kwargs)
-        # Query all departments ordered by name
+        # All departments ordered by name, served from the in-process cache (no query per form)
         # Set choices: list of tuples (value, label)
         # Start with a "None" option (value 0, assuming 0 is not a valid dept ID)
-        self.department_id.choices = [(0, '--- Select Department ---')] + \
-                                     [(dept.id, dept.name) for dept in Department.query.order_by(Department.name).all()]
+        self.department_id.choices = [(0, '--- Select Department ---')] + department_cache.choices()
 
 # Define the event form structure and validation rules
 class EventForm(FlaskForm):
@@ -79,17 +89,18 @@ class EventForm(FlaskForm):
     ], validators=[DataRequired(message='Please select a category.')]) # Made category required
     # Optional: Department Selection (same as NoticeForm)
     department_id = SelectField('Organizing Department (Optional)', coerce=int)
+    # Files are streamed to the content-addressed store when the form is saved (see media.py)
+    attachments = MultipleFileField('Attachments (Optional)', validators=[allowed_attachments])
     submit = SubmitField('Post Event') # Label might change for editing
 
     # --- Populate Department Choices ---
     # Same logic as NoticeForm to populate the dropdown
     def __init__(self, *args, **kwargs):
         super(EventForm, self).__init__(*args, **kwargs)
-        # Query all departments ordered by name
+        # All departments ordered by name, from the department cache
         # Set choices: list of tuples (value, label)
         # Start with a "None" option (value 0)
-        self.department_id.choices = [(0, '--- Select Department ---')] + \
-                                     [(dept.id, dept.name) for dept in Department.query.order_by(Department.name).all()]
+        self.department_id.choices = [(0, '--- Select Department ---')] + department_cache.choices()
 
     # Custom Validator for Event Date
     def validate_event_date(self, field):
@@ -0,0 +1,90 @@
+import os
+import time
+import hashlib
+from datetime import timezone
+from collections import namedtuple
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+# Conditional GET Helpers
+# Pages send an ETag (and a Last-Modified date when there is one) built from the few columns
+# that change whenever the shown data changes. When the browser already has that version
+# (If-None-Match / If-Modified-Since), the route answers 304 Not Modified before rendering the template.
+#
+# Pages are per user (name and role in the sidebar, edit buttons), so the current user is part
+# of every ETag and the responses are marked private.
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+def _deployment_fingerprint():
+    """Changes when the templates change, so a new release doesn't answer 304 with old markup."""
+    fingerprint = current_app.extensions.get('http_cache_fingerprint')
+    if fingerprint is None:
+        digest = hashlib.sha1()
+        for folder, _, files in sorted(os.walk(os.path.join(current_app.root_path, current_app.template_folder))):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(folder, name))
+                digest.update(f'{name}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+        fingerprint = current_app.extensions['http_cache_fingerprint'] = digest.hexdigest()[:12]
+    return fingerprint
+
+def _csrf_epoch():
+    """Number of the CSRF token lifetime half we are in.
+
+    Pages with forms embed a CSRF token that expires after WTF_CSRF_TIME_LIMIT seconds,
+    a kept copy must not outlive it or its form fails. None if tokens don't expire.
+    """
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if not time_limit:
+        return None
+    return int(time.time() // (time_limit / 2))
+
+def to_utc(value):
+    """Stored timestamps are naive UTC (SQLite CURRENT_TIMESTAMP), HTTP dates need an aware datetime."""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def newest(*timestamps):
+    """The latest of the given timestamps, ignoring None (None if there are none)."""
+    timestamps = [value for value in timestamps if value is not None]
+    return max(timestamps) if timestamps else None
+
+def make_validators(*parts, last_modified=None, with_forms=False):
+    """Builds the validators for a page.
+
+    parts are the values that identify the shown version of the data (ids, timestamps, ...).
+    last_modified is the newest timestamp among them (naive UTC), or None.
+    with_forms should be True when the page contains a POST form (CSRF token).
+    """
+    user_part = (current_user.id, current_user.username, current_user.role) if current_user.is_authenticated else None
+    key = [request.endpoint, request.full_path, user_part, _deployment_fingerprint(), parts]
+    if with_forms:
+        key.append(_csrf_epoch())
+    etag = hashlib.sha1(repr(key).encode()).hexdigest()
+    return Validators(etag, to_utc(last_modified))
+
+def not_modified(validators):
+    """Returns a 304 response if the client already has this version of the page, else None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    # Pending flash messages are shown (and consumed) by the next render, don't skip it
+    if session.get('_flashes'):
+        return None
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110), werkzeug handles both
+    if is_resource_modified(request.environ, etag=validators.etag, last_modified=validators.last_modified):
+        return None
+    return add_validators(make_response('', 304), validators)
+
+def add_validators(response, validators):
+    """Adds the ETag/Last-Modified headers to a response (a rendered template string is accepted too)."""
+    response = make_response(response)
+    response.set_etag(validators.etag) # Strong ETag
+    if validators.last_modified is not None:
+        response.last_modified = validators.last_modified
+    # Only the user's own browser may keep a copy, and it has to revalidate it on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,171 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Request Instrumentation (opt-in, INSTRUMENTATION_ENABLED = True)
+# Measures where each request spends its time: SQL statements, Jinja rendering, Markdown rendering
+# and password hashing. The totals are sent in a Server-Timing header (visible in the browser's
+# network panel), added to per-endpoint statistics, and logged as JSON when a request is over budget.
+
+# Slowest statements kept per request for the slow request log
+SLOW_STATEMENTS_LOGGED = 3
+
+class RequestTimings:
+    """Time spent per phase (seconds) during one request, plus the statements it ran."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {} # phase name -> seconds
+        self.counts = {} # phase name -> number of times it ran
+        self.statements = [] # (seconds, SQL) of the slowest statements
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def add_statement(self, statement, seconds):
+        self.add('db', seconds)
+        self.statements.append((seconds, statement))
+        self.statements.sort(key=lambda item: item[0], reverse=True)
+        del self.statements[SLOW_STATEMENTS_LOGGED:]
+
+def current_timings():
+    """The RequestTimings of the current request, or None (outside requests or when disabled)."""
+    if has_request_context():
+        return g.get('request_timings')
+    return None
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the block to the current request's timings under name.
+
+    Costs nothing more than a context lookup when instrumentation is off.
+    """
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+# Per-Endpoint Statistics
+class EndpointStats:
+    """Request count, total time and statement totals per endpoint, for this worker process."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, total, timings):
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {
+                'requests': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+                'statements': 0, 'db_seconds': 0.0, 'template_seconds': 0.0,
+            })
+            stats['requests'] += 1
+            stats['total_seconds'] += total
+            stats['max_seconds'] = max(stats['max_seconds'], total)
+            stats['statements'] += timings.counts.get('db', 0)
+            stats['db_seconds'] += timings.durations.get('db', 0.0)
+            stats['template_seconds'] += timings.durations.get('template', 0.0)
+
+    def snapshot(self):
+        """Copy of the statistics, endpoint -> dict of totals."""
+        with self._lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+endpoint_stats = EndpointStats()
+
+# Hooks
+# Server-Timing metric names and descriptions, in header order
+SERVER_TIMING_METRICS = [('db', 'SQL'), ('template', 'Templates'), ('markdown', 'Markdown'), ('password', 'Password hashing')]
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_timings() is not None:
+        conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = current_timings()
+    starts = conn.info.get('instrumentation_start')
+    if timings is not None and starts:
+        timings.add_statement(statement, time.perf_counter() - starts.pop())
+
+def _before_render_template(sender, template, context, **extra):
+    timings = current_timings()
+    if timings is not None:
+        g.setdefault('template_starts', []).append(time.perf_counter())
+
+def _template_rendered(sender, template, context, **extra):
+    timings = current_timings()
+    starts = g.get('template_starts')
+    if timings is not None and starts:
+        timings.add('template', time.perf_counter() - starts.pop())
+
+def server_timing_header(timings, total):
+    parts = []
+    for name, description in SERVER_TIMING_METRICS:
+        if name in timings.durations:
+            count = timings.counts[name]
+            label = f'{description} ({count})' if name == 'db' else description
+            parts.append(f'{name};dur={timings.durations[name] * 1000:.1f};desc="{label}"')
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+def init_instrumentation(app):
+    """Registers the hooks when INSTRUMENTATION_ENABLED is set. Called from create_app."""
+    if not app.config.get('INSTRUMENTATION_ENABLED', False):
+        return
+    from app import db
+    with app.app_context():
+        engines = list(db.engines.values()) # The primary and the read replica (see db_routing.py)
+    budget_ms = app.config.get('SLOW_REQUEST_MS', 500)
+    send_header = app.config.get('SERVER_TIMING_HEADER', True)
+
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_request_timings():
+        g.request_timings = RequestTimings()
+
+    @app.after_request
+    def finish_request_timings(response):
+        # Runs before a streamed body is sent, streamed responses are measured up to the first byte
+        timings = current_timings()
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.start
+        endpoint = request.endpoint or 'unmatched'
+        endpoint_stats.record(endpoint, total, timings)
+        if send_header:
+            response.headers['Server-Timing'] = server_timing_header(timings, total)
+        if budget_ms is not None and total * 1000 > budget_ms:
+            # One JSON object per line, so log tooling can parse it
+            app.logger.warning(json.dumps({
+                'event': 'slow_request',
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'budget_ms': budget_ms,
+                'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in timings.durations.items()},
+                'statements': timings.counts.get('db', 0),
+                'slowest_statements': [
+                    {'ms': round(seconds * 1000, 1), 'sql': ' '.join(statement.split())[:300]}
+                    for seconds, statement in timings.statements
+                ],
+            }))
+        return response
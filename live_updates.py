@@ -0,0 +1,213 @@
+import os
+import json
+import glob
+import time
+import socket
+import threading
+from collections import deque
+from flask import current_app, url_for
+from jinja2.filters import do_truncate
+from caches import department_cache
+
+# Live Updates (Server-Sent Events)
+# New, edited and deleted notices and events are pushed to the open list pages (see routes/live.py
+# and static/js/live_updates.js) instead of students reloading them over and over.
+# The routes publish to one Broadcaster per worker process after their commit. Every open stream
+# waits on the broadcaster's condition and reads the shared history, so idle connections cost no
+# queries and no per-connection buffers, only a thread (or greenlet) each.
+# With several worker processes, LIVE_UPDATES_SOCKET_DIR relays the updates between them: every
+# worker with open streams binds a Unix datagram socket in that directory, a publish sends the
+# update to all of them.
+
+# Largest update sent between workers (a notice update is a few hundred bytes)
+MAX_DATAGRAM_SIZE = 64 * 1024
+
+class Broadcaster:
+    """Fans published updates out to the waiting streams of this process, see the module comment."""
+
+    def __init__(self, history_size=200):
+        self._condition = threading.Condition()
+        # (sequence, event id, event name, JSON data), the last history_size updates
+        self._history = deque(maxlen=history_size)
+        self._sequence = 0 # Local position, event ids come from the publishing process
+        self._counter = 0
+        self.clients = 0
+        self.socket_dir = None
+        self._socket = None
+        self._socket_pid = None
+
+    def configure(self, history_size, socket_dir):
+        with self._condition:
+            self._history = deque(self._history, maxlen=history_size)
+        self.socket_dir = socket_dir
+
+    def _append(self, event_id, name, data):
+        with self._condition:
+            self._sequence += 1
+            self._history.append((self._sequence, event_id, name, data))
+            self._condition.notify_all()
+
+    def publish(self, name, payload):
+        """Sends an update to the streams of every worker process."""
+        data = json.dumps(payload, separators=(',', ':'))
+        with self._condition:
+            self._counter += 1
+            # Unique over all workers, so a browser reconnecting to another worker resumes correctly
+            event_id = f'{os.getpid()}-{time.time_ns() // 1_000_000}-{self._counter}'
+        self._append(event_id, name, data)
+        if self.socket_dir:
+            self._relay(json.dumps([event_id, name, data]).encode())
+
+    def _relay(self, message):
+        own_path = self._socket_path() if self._socket_pid == os.getpid() else None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False) # A stuck worker must not hold up the request that published
+            for path in glob.glob(os.path.join(self.socket_dir, '*.sock')):
+                if path == own_path:
+                    continue
+                try:
+                    sender.sendto(message, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Left behind by a worker that exited
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                except OSError:
+                    pass # Receive buffer full, that worker's browsers catch up on the next reload
+
+    def _socket_path(self):
+        return os.path.join(self.socket_dir, f'{os.getpid()}.sock')
+
+    def _ensure_listener(self):
+        # Started by the first stream of each worker (after the fork, threads don't survive it)
+        if not self.socket_dir or self._socket_pid == os.getpid():
+            return
+        with self._condition:
+            if self._socket_pid == os.getpid():
+                return
+            os.makedirs(self.socket_dir, exist_ok=True)
+            path = self._socket_path()
+            if os.path.exists(path):
+                os.unlink(path) # Same pid as a worker of an earlier run
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            self._socket, self._socket_pid = receiver, os.getpid()
+        threading.Thread(target=self._listen, args=(receiver,), name='live-updates-relay', daemon=True).start()
+
+    def _listen(self, receiver):
+        while True:
+            message = receiver.recv(MAX_DATAGRAM_SIZE)
+            try:
+                event_id, name, data = json.loads(message)
+            except (ValueError, TypeError):
+                continue
+            self._append(event_id, name, data)
+
+    def position(self, last_event_id=None):
+        """Sequence to continue after: the browser's Last-Event-ID, or now.
+
+        Returns (sequence, found), found is False if that update is no longer in the history.
+        """
+        with self._condition:
+            if last_event_id:
+                for sequence, event_id, _, _ in self._history:
+                    if event_id == last_event_id:
+                        return sequence, True
+                return self._sequence, False
+            return self._sequence, True
+
+    def wait(self, after, timeout):
+        """Updates published after the sequence `after`, waits up to timeout seconds for the first one.
+
+        Returns (sequence to continue after, updates, complete), complete is False if updates were
+        dropped from the history before this stream read them.
+        """
+        with self._condition:
+            if self._sequence == after:
+                self._condition.wait(timeout)
+            updates = [entry for entry in self._history if entry[0] > after]
+            complete = not updates or updates[0][0] == after + 1
+            return self._sequence, [entry[1:] for entry in updates], complete
+
+    def stream(self, last_event_id, heartbeat, duration, retry_ms):
+        """Server-Sent Events for one browser, ends after duration seconds (the browser reconnects)."""
+        self._ensure_listener()
+        with self._condition:
+            self.clients += 1
+        try:
+            yield f'retry: {retry_ms}\n\n' # Reconnect delay
+            after, found = self.position(last_event_id)
+            if not found:
+                # Missed more than the history holds, the page reloads its list
+                yield 'event: reset\ndata: {}\n\n'
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                after, updates, complete = self.wait(after, heartbeat)
+                if not complete:
+                    yield 'event: reset\ndata: {}\n\n'
+                if not updates:
+                    yield ': keepalive\n\n' # Lets proxies and the browser notice dead connections
+                for event_id, name, data in updates:
+                    yield f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'
+        finally:
+            with self._condition:
+                self.clients -= 1
+
+broadcaster = Broadcaster()
+
+# Update Payloads
+# What the list pages show for a row (see the data-field cells in notice_list.html / event_list.html)
+def _department_name(department_id):
+    department = department_cache.get(department_id) if department_id else None
+    return department.name if department else 'N/A'
+
+def _date(value):
+    return value.strftime('%Y-%m-%d %H:%M') if value else ''
+
+def publish_notice(notice, action):
+    """Publishes a committed notice, action is 'created', 'updated' or 'deleted'."""
+    if not current_app.config['LIVE_UPDATES_ENABLED']:
+        return
+    payload = {'action': action, 'id': notice.id}
+    if action != 'deleted':
+        payload.update({
+            'url': url_for('notice.notice_detail', notice_id=notice.id),
+            'title': notice.title,
+            'excerpt': do_truncate(current_app.jinja_env, notice.excerpt or '', 80),
+            'department_id': notice.department_id,
+            'department': _department_name(notice.department_id),
+            'date': _date(notice.issue_date),
+            'publisher': notice.publisher.username,
+            'last_editor': notice.last_editor.username if notice.last_editor else 'N/A',
+        })
+    broadcaster.publish('notice', payload)
+
+def publish_event(event, action):
+    """Publishes a committed event, action is 'created', 'updated' or 'deleted'."""
+    if not current_app.config['LIVE_UPDATES_ENABLED']:
+        return
+    payload = {'action': action, 'id': event.id}
+    if action != 'deleted':
+        payload.update({
+            'url': url_for('event.event_detail', event_id=event.id),
+            'title': event.title,
+            'date': _date(event.event_date),
+            'category': event.category,
+            'department_id': event.department_id,
+            'department': _department_name(event.department_id),
+            'venue': event.venue,
+            'organizer': event.organizer.username,
+        })
+    broadcaster.publish('event', payload)
+
+def init_live_updates(app):
+    """Live update settings defaults. Called from create_app."""
+    app.config.setdefault('LIVE_UPDATES_ENABLED', True)
+    app.config.setdefault('LIVE_UPDATES_HEARTBEAT', 25) # Seconds between keepalive comments
+    app.config.setdefault('LIVE_UPDATES_STREAM_DURATION', 3600) # Seconds before a stream ends and the browser reconnects
+    app.config.setdefault('LIVE_UPDATES_MAX_CLIENTS', 1000) # Open streams per worker process
+    app.config.setdefault('LIVE_UPDATES_HISTORY', 200) # Updates kept for reconnecting browsers
+    app.config.setdefault('LIVE_UPDATES_RETRY_MS', 5000) # Browser reconnect delay
+    app.config.setdefault('LIVE_UPDATES_SOCKET_DIR', None)
+    broadcaster.configure(app.config['LIVE_UPDATES_HISTORY'], app.config['LIVE_UPDATES_SOCKET_DIR'])
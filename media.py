@@ -0,0 +1,135 @@
+import os
+import time
+import hashlib
+import mimetypes
+import tempfile
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+# Content-Addressed Media Storage
+# Uploaded files are stored under MEDIA_ROOT by the SHA-256 hash of their content
+# (MEDIA_ROOT/ab/cd/abcd...), so a PDF attached to many notices is stored once.
+# MediaFile rows are the attachments: the original filename plus the hash of the stored content.
+# Files no attachment refers to any more are removed by `flask gc-media`.
+
+# Uploads are hashed and written to disk this many bytes at a time
+CHUNK_SIZE = 64 * 1024
+# A hash is 64 lowercase hex digits
+HASH_LENGTH = 64
+# Shown inline by the browser, everything else is downloaded (never render uploaded HTML/SVG on our origin)
+INLINE_CONTENT_TYPES = {'application/pdf', 'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'text/plain'}
+
+def media_root():
+    return current_app.config['MEDIA_ROOT']
+
+def blob_path(content_hash):
+    """Where the content with this hash is stored."""
+    return os.path.join(media_root(), content_hash[:2], content_hash[2:4], content_hash)
+
+def is_allowed_filename(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    return extension in current_app.config['MEDIA_ALLOWED_EXTENSIONS']
+
+def guess_content_type(filename, fallback=None):
+    # The extension was checked against the allowed list, the browser's claim wasn't
+    return mimetypes.guess_type(filename)[0] or fallback or 'application/octet-stream'
+
+def store_stream(stream):
+    """Writes a file stream to the store, returns (content_hash, size).
+
+    The stream is read in CHUNK_SIZE pieces that are hashed and written to a temporary file
+    next to the store, so memory use doesn't grow with the file. The finished file is then
+    renamed to its hash, or dropped if the same content is stored already.
+    """
+    temp_dir = os.path.join(media_root(), 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    handle, temp_path = tempfile.mkstemp(dir=temp_dir, prefix='upload-')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+                size += len(chunk)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        content_hash = digest.hexdigest()
+        target = blob_path(content_hash)
+        if os.path.exists(target):
+            os.remove(temp_path) # Same content stored before
+            os.utime(target) # Recently used, keeps `flask gc-media` from removing it before the commit
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, target) # Atomic, a concurrent upload of the same file ends with the same content
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return content_hash, size
+
+def attach_uploads(parent, uploads):
+    """Stores the uploaded files (werkzeug FileStorage objects) and attaches them to a Notice or Event.
+
+    Returns the number of files attached, empty file inputs are skipped.
+    """
+    from models import MediaFile
+    from media_jobs import queue_previews
+    attached = 0
+    for upload in uploads or []:
+        if not upload or not upload.filename:
+            continue
+        filename = secure_filename(upload.filename) or 'file'
+        content_hash, size = store_stream(upload.stream)
+        media_file = MediaFile(
+            filename=filename,
+            content_hash=content_hash,
+            content_type=guess_content_type(filename, upload.mimetype),
+            size=size,
+        )
+        parent.media_files.append(media_file)
+        queue_previews(media_file) # Thumbnails are made by `flask media-worker`
+        attached += 1
+    return attached
+
+def collect_garbage(grace_seconds=3600):
+    """Removes stored files no attachment refers to, returns (files removed, bytes freed).
+
+    Files changed within grace_seconds are kept: they may belong to an upload whose
+    transaction hasn't committed yet. Leftover temporary files of failed uploads are removed too.
+    """
+    from app import db
+    from models import MediaFile, ArchivedMediaFile
+    root = media_root()
+    if not os.path.isdir(root):
+        return 0, 0
+    referenced = set()
+    for model in (MediaFile, ArchivedMediaFile): # Attachments of archived events keep their files
+        referenced.update(row.content_hash for row in db.session.query(model.content_hash).filter(model.content_hash.isnot(None)).distinct())
+    cutoff = time.time() - grace_seconds
+    removed = freed = 0
+    for directory, _, filenames in os.walk(root):
+        in_temp_dir = os.path.basename(directory) == 'tmp'
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            # Stored files are named by their hash, their previews start with it (see media_jobs.py)
+            if not in_temp_dir and (len(filename) < HASH_LENGTH or filename[:HASH_LENGTH] in referenced):
+                continue
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            os.remove(path)
+            removed += 1
+            freed += stat.st_size
+    return removed, freed
+
+def init_media(app):
+    """Media settings defaults. Called from create_app."""
+    app.config.setdefault('MEDIA_ROOT', os.path.join(app.instance_path, 'media'))
+    app.config.setdefault('MEDIA_ALLOWED_EXTENSIONS', {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'webp', 'txt', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'zip'})
+    # Stored files never change (the URL contains the hash), browsers may keep them for a year
+    app.config.setdefault('MEDIA_CACHE_MAX_AGE', 365 * 24 * 3600)
@@ -0,0 +1,201 @@
+import os
+import time
+import shutil
+import socket
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta, timezone
+from app import db
+
+# Preview Generation Jobs
+# Rendering thumbnails would block a request worker for a while (large images, PDFs), so uploads only
+# queue a job (MediaJob row) and `flask media-worker` renders the images in a pool of worker processes.
+# The images are stored next to the original in the media store (<hash>-thumb.webp, <hash>-preview.webp)
+# and recorded on every MediaFile with that content. Until then the templates show a placeholder.
+
+# Longest side in pixels: thumbnails for list pages and attachment lists, previews for detail pages
+PREVIEW_SIZES = {'thumb': 160, 'preview': 800}
+PREVIEW_FORMAT = 'webp'
+# Content types a preview can be made of
+IMAGE_CONTENT_TYPES = {'image/png', 'image/jpeg', 'image/gif', 'image/webp'}
+PDF_CONTENT_TYPE = 'application/pdf'
+# Failed jobs are retried after RETRY_DELAY * attempts, up to MAX_ATTEMPTS
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(minutes=1)
+# Jobs 'running' for longer than this belong to a worker that died, they are run again
+STALE_AFTER = timedelta(minutes=15)
+# pdftoppm (poppler-utils) renders the first page of PDFs, without it PDFs get no preview
+PDFTOPPM_TIMEOUT = 60
+
+class PreviewUnavailable(Exception):
+    """No preview can be made of this file (not retried)."""
+
+def has_preview(content_type):
+    return content_type in IMAGE_CONTENT_TYPES or content_type == PDF_CONTENT_TYPE
+
+def preview_filename(content_hash, kind):
+    return f'{content_hash}-{kind}.{PREVIEW_FORMAT}'
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None) # Stored timestamps are naive UTC
+
+# Rendering (runs in the pool's worker processes, no app or database access)
+def _open_first_page(source_path, content_type, temp_dir):
+    from PIL import Image
+    if content_type != PDF_CONTENT_TYPE:
+        return Image.open(source_path)
+    if shutil.which('pdftoppm') is None:
+        raise PreviewUnavailable('pdftoppm is not installed')
+    output_prefix = os.path.join(temp_dir, 'page')
+    # First page only, sized so the preview is sharp
+    subprocess.run(
+        ['pdftoppm', '-f', '1', '-l', '1', '-singlefile', '-png', '-scale-to', str(max(PREVIEW_SIZES.values())), source_path, output_prefix],
+        check=True, capture_output=True, timeout=PDFTOPPM_TIMEOUT
+    )
+    return Image.open(output_prefix + '.png')
+
+def render_previews(source_path, content_type):
+    """Writes the preview images of a stored file next to it, returns {kind: filename}."""
+    from PIL import Image, ImageOps
+    directory, content_hash = os.path.split(source_path)
+    names = {}
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        with _open_first_page(source_path, content_type, temp_dir) as image:
+            image.seek(0) # First frame of animated images
+            image = ImageOps.exif_transpose(image) # Photos taken sideways
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            for kind, size in PREVIEW_SIZES.items():
+                resized = image.copy()
+                resized.thumbnail((size, size)) # Keeps the aspect ratio, never enlarges
+                name = preview_filename(content_hash, kind)
+                temp_path = os.path.join(temp_dir, name)
+                resized.save(temp_path, PREVIEW_FORMAT, quality=80)
+                os.replace(temp_path, os.path.join(directory, name))
+                names[kind] = name
+    return names
+
+# Queue
+def queue_previews(media_file):
+    """Called for a new attachment: reuses previews of the same content, or queues a job for them."""
+    from models import MediaJob
+    from media import blob_path
+    if not has_preview(media_file.content_type):
+        return
+    path = blob_path(media_file.content_hash)
+    names = {kind: preview_filename(media_file.content_hash, kind) for kind in PREVIEW_SIZES}
+    if all(os.path.exists(os.path.join(os.path.dirname(path), name)) for name in names.values()):
+        media_file.thumbnail, media_file.preview = names['thumb'], names['preview']
+        media_file.preview_status = 'ready'
+        return
+    media_file.preview_status = 'pending'
+    media_file.jobs.append(MediaJob())
+
+CLAIM_JOB_SQL = db.text("""
+    UPDATE media_job SET status = 'running', claimed_at = :now, worker = :worker, attempts = attempts + 1
+    WHERE id = (
+        SELECT id FROM media_job WHERE status = 'pending' AND run_after <= :now ORDER BY run_after, id LIMIT 1
+    )
+    RETURNING id, media_file_id
+""")
+
+def claim_job(worker):
+    """Marks the oldest runnable job as running and returns (job id, media file id), or None.
+
+    A single UPDATE ... RETURNING, so two workers never claim the same job.
+    """
+    row = db.session.execute(CLAIM_JOB_SQL, {'now': utcnow(), 'worker': worker}).first()
+    db.session.commit()
+    return row
+
+def requeue_stale_jobs():
+    """Puts jobs back whose worker died while running them. Returns how many."""
+    from models import MediaJob
+    count = MediaJob.query.filter(MediaJob.status == 'running', MediaJob.claimed_at < utcnow() - STALE_AFTER) \
+        .update({MediaJob.status: 'pending', MediaJob.worker: None}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+def finish_job(job_id, content_hash, names=None, error=None, permanent=False):
+    """Records the result: previews on every attachment with this content, or a retry/failure."""
+    from models import MediaJob, MediaFile
+    job = db.session.get(MediaJob, job_id)
+    if job is None:
+        return # The attachment was removed meanwhile
+    if error is None:
+        same_content = db.session.query(MediaFile.id).filter(MediaFile.content_hash == content_hash)
+        MediaFile.query.filter(MediaFile.id.in_(same_content)) \
+            .update({MediaFile.thumbnail: names['thumb'], MediaFile.preview: names['preview'], MediaFile.preview_status: 'ready'},
+                    synchronize_session=False)
+        # Queued jobs of other attachments with the same content have nothing left to do
+        MediaJob.query.filter(MediaJob.media_file_id.in_(same_content), MediaJob.status == 'pending') \
+            .delete(synchronize_session=False)
+        db.session.delete(job)
+    elif permanent or job.attempts >= MAX_ATTEMPTS:
+        job.status = 'failed'
+        job.last_error = error
+        if job.media_file is not None:
+            job.media_file.preview_status = 'failed'
+    else:
+        job.status = 'pending'
+        job.last_error = error
+        job.worker = None
+        job.run_after = utcnow() + RETRY_DELAY * job.attempts
+    db.session.commit()
+
+def run_worker(processes=2, poll_interval=2.0, once=False, log=print):
+    """Claims queued jobs and renders their previews in a process pool until interrupted.
+
+    With once=True it returns as soon as the queue has no runnable jobs left.
+    """
+    from models import MediaFile
+    from media import blob_path
+    worker = f'{socket.gethostname()}:{os.getpid()}'[:50]
+    stale = requeue_stale_jobs()
+    if stale:
+        log(f'Requeued {stale} jobs of a worker that stopped.')
+    running = {} # future -> (job id, content hash)
+    # spawn: the rendering processes start clean instead of inheriting the database connections
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+        try:
+            while True:
+                while len(running) < processes:
+                    claimed = claim_job(worker)
+                    if claimed is None:
+                        break
+                    job_id, media_file_id = claimed
+                    media_file = db.session.get(MediaFile, media_file_id)
+                    if media_file is None or not media_file.content_hash:
+                        finish_job(job_id, None, error='Attachment has no stored file', permanent=True)
+                        continue
+                    future = pool.submit(render_previews, blob_path(media_file.content_hash), media_file.content_type)
+                    running[future] = (job_id, media_file.content_hash)
+                db.session.close() # Don't hold a connection (or a read snapshot) while waiting
+
+                if not running:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id, content_hash = running.pop(future)
+                    try:
+                        names = future.result()
+                    except PreviewUnavailable as error:
+                        finish_job(job_id, content_hash, error=str(error), permanent=True)
+                        log(f'Job {job_id}: no preview ({error})')
+                    except Exception as error:
+                        finish_job(job_id, content_hash, error=f'{type(error).__name__}: {error}')
+                        log(f'Job {job_id}: failed ({type(error).__name__}: {error})')
+                    else:
+                        finish_job(job_id, content_hash, names=names)
+                        log(f'Job {job_id}: previews ready for {content_hash[:12]}')
+        finally:
+            # Interrupted: jobs that were still rendering go back to the queue
+            from models import MediaJob
+            if running:
+                MediaJob.query.filter(MediaJob.id.in_([job_id for job_id, _ in running.values()])) \
+                    .update({MediaJob.status: 'pending', MediaJob.worker: None}, synchronize_session=False)
+                db.session.commit()
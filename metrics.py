@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from flask import g, request, got_request_exception
+from sqlalchemy import event
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from caches import registered_caches
+
+# Prometheus Metrics (served at /metrics, see routes/metrics.py)
+# Request rate, errors and latency per endpoint, DB pool usage and cache hit rates.
+# With several worker processes, set the PROMETHEUS_MULTIPROC_DIR environment variable to an empty
+# directory before the workers start: every process then writes its values to mmap'ed files there,
+# and a scrape of any worker returns the sum over all of them.
+
+# Latency buckets (seconds), from cached pages (~1ms) to slow list/search pages
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Requests
+REQUESTS = Counter('college_portal_requests', 'HTTP requests handled',
+                   ['endpoint', 'method', 'status'])
+EXCEPTIONS = Counter('college_portal_request_exceptions', 'Requests that raised an unhandled exception',
+                     ['endpoint', 'exception'])
+LATENCY = Histogram('college_portal_request_duration_seconds', 'Time until the response is returned (first byte for streamed responses)',
+                    ['endpoint'], buckets=LATENCY_BUCKETS)
+
+# Database Connection Pool
+# livesum: the values of exited worker processes are dropped (see README, gunicorn child_exit)
+DB_CONNECTIONS_IN_USE = Gauge('college_portal_db_connections_in_use', 'Pool connections currently checked out',
+                              multiprocess_mode='livesum')
+DB_POOL_SIZE = Gauge('college_portal_db_pool_size', 'Configured pool size, summed over worker processes',
+                     multiprocess_mode='livesum')
+DB_CONNECTIONS_OPENED = Counter('college_portal_db_connections_opened', 'New DB connections opened by the pool')
+DB_CHECKOUTS = Counter('college_portal_db_checkouts', 'Connections checked out of the pool')
+
+# In-Process Caches (see caches.register_cache)
+CACHE_HITS = Counter('college_portal_cache_hits', 'Cache lookups answered from the cache', ['cache'])
+CACHE_MISSES = Counter('college_portal_cache_misses', 'Cache lookups that had to load the data', ['cache'])
+CACHE_ENTRIES = Gauge('college_portal_cache_entries', 'Entries held, summed over worker processes', ['cache'],
+                      multiprocess_mode='livesum')
+
+# Each cache counts hits/misses as plain integers, only the increase since the last sync is added
+# to the counters (cheap enough to do after every request)
+_synced_counts = {} # cache name -> (hits, misses) at the last sync
+_sync_lock = threading.Lock()
+
+def sync_cache_metrics():
+    with _sync_lock:
+        for name, cache in registered_caches.items():
+            stats = cache.stats()
+            hits, misses = stats.get('hits', 0), stats.get('misses', 0)
+            last_hits, last_misses = _synced_counts.get(name, (0, 0))
+            # Counters never go down, a reset cache starts counting from zero again
+            CACHE_HITS.labels(name).inc(hits - last_hits if hits >= last_hits else hits)
+            CACHE_MISSES.labels(name).inc(misses - last_misses if misses >= last_misses else misses)
+            _synced_counts[name] = (hits, misses)
+            CACHE_ENTRIES.labels(name).set(stats.get('size', 0))
+
+# Pool Hooks
+def _on_connect(dbapi_connection, connection_record):
+    DB_CONNECTIONS_OPENED.inc()
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_CHECKOUTS.inc()
+    DB_CONNECTIONS_IN_USE.inc()
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_CONNECTIONS_IN_USE.dec()
+
+def metrics_registry():
+    """Registry to scrape: all worker processes in multiprocess mode, otherwise this process."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def render_metrics():
+    """(body, content type) of the Prometheus text format."""
+    sync_cache_metrics()
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+def init_metrics(app):
+    """Registers the request and pool hooks. Called from create_app."""
+    from app import db
+    app.config.setdefault('METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    with app.app_context():
+        pools = [engine.pool for engine in db.engines.values()] # The primary and the read replica
+    pool_size = 0
+    for pool in pools:
+        if not event.contains(pool, 'checkout', _on_checkout):
+            event.listen(pool, 'connect', _on_connect)
+            event.listen(pool, 'checkout', _on_checkout)
+            event.listen(pool, 'checkin', _on_checkin)
+        if hasattr(pool, 'size'): # Not every pool class has a fixed size (e.g. SQLite :memory:)
+            pool_size += pool.size()
+    DB_POOL_SIZE.set(pool_size)
+
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        LATENCY.labels(endpoint).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        sync_cache_metrics()
+        return response
+
+    def record_exception(sender, exception, **extra):
+        EXCEPTIONS.labels(request.endpoint or 'unmatched', type(exception).__name__).inc()
+
+    got_request_exception.connect(record_exception, app)
@@ -58,6 +58,15 @@ naming_convention = {
     "pk": "pk_%(table_name)s"
 }
 
+# Tables created by hand in migrations (not by the models), e.g. the FTS5 search
+# index and its shadow tables. Autogenerate must not try to drop them.
+UNMANAGED_TABLE_PREFIXES = ('notice_fts', 'event_fts')
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and name.startswith(UNMANAGED_TABLE_PREFIXES):
+        return False
+    return True
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -72,7 +81,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -107,6 +117,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             naming_convention=naming_convention,
+            include_object=include_object,
             **conf_args,
         )
 
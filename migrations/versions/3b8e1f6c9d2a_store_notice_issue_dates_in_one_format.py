@@ -0,0 +1,29 @@
+"""Store notice issue dates in one format
+
+Revision ID: 3b8e1f6c9d2a
+Revises: 80f5793dba05
+Create Date: 2026-10-18 11:02:17.204311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b8e1f6c9d2a'
+down_revision = '80f5793dba05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Notices posted from the form got the database default (CURRENT_TIMESTAMP, '2026-10-18 10:21:39')
+    # while everything else is written by SQLAlchemy with microseconds ('2026-10-18 10:21:39.000000').
+    # SQLite compares them as text, so keyset cursors and date filters on issue_date skipped and
+    # repeated rows. Same point in time, only the text changes (it does fire the change log triggers).
+    op.execute("UPDATE notice SET issue_date = issue_date || '.000000' WHERE length(issue_date) = 19")
+
+
+def downgrade():
+    # Nothing to undo, the values are the same datetimes
+    pass
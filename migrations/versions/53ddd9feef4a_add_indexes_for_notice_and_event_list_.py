@@ -0,0 +1,53 @@
+"""Add indexes for notice and event list filters and sorts
+
+Revision ID: 53ddd9feef4a
+Revises: c53c2cab1354
+Create Date: 2026-10-18 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '53ddd9feef4a'
+down_revision = 'c53c2cab1354'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # ### indexes backing the notice_list / event_list / index query shapes ###
+    with op.batch_alter_table('notice', schema=None) as batch_op:
+        # Default sort (newest first) and date range filters
+        batch_op.create_index('ix_notice_issue_date', ['issue_date'], unique=False)
+        # Department filter, sorted by date
+        batch_op.create_index('ix_notice_department_id_issue_date', ['department_id', 'issue_date'], unique=False)
+        # Sort by title
+        batch_op.create_index('ix_notice_title', ['title'], unique=False)
+
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        # Default sort (upcoming first), date range filters and the dashboard "upcoming events"
+        batch_op.create_index('ix_event_event_date', ['event_date'], unique=False)
+        # Department filter, sorted by date
+        batch_op.create_index('ix_event_department_id_event_date', ['department_id', 'event_date'], unique=False)
+        # Category filter sorted by date, and sort by category
+        batch_op.create_index('ix_event_category_event_date', ['category', 'event_date'], unique=False)
+        # Sort by title
+        batch_op.create_index('ix_event_title', ['title'], unique=False)
+    # ### end Alembic commands ###
+
+
+def downgrade():
+    # ### drop the list indexes ###
+    with op.batch_alter_table('event', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_title')
+        batch_op.drop_index('ix_event_category_event_date')
+        batch_op.drop_index('ix_event_department_id_event_date')
+        batch_op.drop_index('ix_event_event_date')
+
+    with op.batch_alter_table('notice', schema=None) as batch_op:
+        batch_op.drop_index('ix_notice_title')
+        batch_op.drop_index('ix_notice_department_id_issue_date')
+        batch_op.drop_index('ix_notice_issue_date')
+    # ### end Alembic commands ###
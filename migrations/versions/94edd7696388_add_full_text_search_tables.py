@@ -0,0 +1,71 @@
+"""Add full-text search tables for notices and events
+
+Revision ID: 94edd7696388
+Revises: 842b7c88e334
+Create Date: 2026-10-18 14:05:52.301477
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '94edd7696388'
+down_revision = '842b7c88e334'
+branch_labels = None
+depends_on = None
+
+# FTS5 "external content" tables: the text lives only in notice/event, the index is kept
+# in sync by the triggers below. Not managed by the models, so env.py excludes them from autogenerate.
+# Note: batch_alter_table operations that recreate notice/event (copy + rename) drop these
+# triggers, such migrations have to create them again.
+
+NOTICE_FTS = [
+    "CREATE VIRTUAL TABLE notice_fts USING fts5("
+    "title, content, content='notice', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER notice_fts_ai AFTER INSERT ON notice BEGIN "
+    "INSERT INTO notice_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    "CREATE TRIGGER notice_fts_ad AFTER DELETE ON notice BEGIN "
+    "INSERT INTO notice_fts(notice_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "END",
+    "CREATE TRIGGER notice_fts_au AFTER UPDATE OF title, content ON notice BEGIN "
+    "INSERT INTO notice_fts(notice_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO notice_fts(rowid, title, content) VALUES (new.id, new.title, new.content); "
+    "END",
+    # Index the rows that already exist
+    "INSERT INTO notice_fts(notice_fts) VALUES ('rebuild')",
+]
+
+EVENT_FTS = [
+    "CREATE VIRTUAL TABLE event_fts USING fts5("
+    "title, description, venue, content='event', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER event_fts_ai AFTER INSERT ON event BEGIN "
+    "INSERT INTO event_fts(rowid, title, description, venue) VALUES (new.id, new.title, new.description, new.venue); "
+    "END",
+    "CREATE TRIGGER event_fts_ad AFTER DELETE ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, title, description, venue) VALUES ('delete', old.id, old.title, old.description, old.venue); "
+    "END",
+    "CREATE TRIGGER event_fts_au AFTER UPDATE OF title, description, venue ON event BEGIN "
+    "INSERT INTO event_fts(event_fts, rowid, title, description, venue) VALUES ('delete', old.id, old.title, old.description, old.venue); "
+    "INSERT INTO event_fts(rowid, title, description, venue) VALUES (new.id, new.title, new.description, new.venue); "
+    "END",
+    "INSERT INTO event_fts(event_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade():
+    # FTS5 is SQLite only, other databases keep working without /search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for statement in NOTICE_FTS + EVENT_FTS:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for trigger in ['notice_fts_ai', 'notice_fts_ad', 'notice_fts_au', 'event_fts_ai', 'event_fts_ad', 'event_fts_au']:
+        op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    op.execute('DROP TABLE IF EXISTS notice_fts')
+    op.execute('DROP TABLE IF EXISTS event_fts')
@@ -2,6 +2,24 @@ from app import db # Import the db instance from app.py
 from werkzeug.security import generate_password_hash, check_password_hash # Import the functions needed to hash and check passwords securely.
 from flask_login import UserMixin # Import the necessary tools for user session management.
 from sqlalchemy.sql import func # Import func for onupdate/default timestamps
+from flask_misaka import markdown # Same renderer (and default options) as the `markdown` template filter
+from markupsafe import Markup
+from instrumentation import timed # Request timing phases (no-op unless INSTRUMENTATION_ENABLED)
+from media_jobs import utcnow # Naive UTC, like the database's CURRENT_TIMESTAMP
+
+# Length of the stored plaintext excerpt (list pages truncate it further for display)
+EXCERPT_LENGTH = 255
+
+def render_markdown(text):
+    """Renders Markdown once at write time.
+
+    Returns (html, excerpt), the excerpt is the plaintext of the HTML with tags stripped.
+    """
+    with timed('markdown'):
+        html = str(markdown(text))
+    # Markup.striptags is what the `striptags` template filter uses (also collapses whitespace)
+    excerpt = Markup(html).striptags()[:EXCERPT_LENGTH]
+    return html, excerpt
 
 # Define the User model (represents the 'user' table in the database)
 class User(db.Model, UserMixin): # Added UserMixin inheritance
@@ -34,12 +52,14 @@ class User(db.Model, UserMixin): # Added UserMixin inheritance
     # --- Password Hashing Methods ---
     def set_password(self, password):
         """Hashes the provided password and stores it."""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256') # Using a strong method
+        with timed('password'):
+            self.password_hash = generate_password_hash(password, method='pbkdf2:sha256') # Using a strong method
 
     def check_password(self, password):
         """Checks if the provided password matches the stored hash."""
         # Returns True if passwords match, False otherwise.
-        return check_password_hash(self.password_hash, password)
+        with timed('password'):
+            return check_password_hash(self.password_hash, password)
 
     # --- Role Checking Methods (Optional but useful for templates/routes) ---
     def is_admin(self):
@@ -71,11 +91,21 @@ class Department(db.Model):
 
 # Define the Notice model
 class Notice(db.Model):
+    # Composite index for the department filter in notice_list (sorted by date)
+    __table_args__ = (
+        db.Index('ix_notice_department_id_issue_date', 'department_id', 'issue_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
+    title = db.Column(db.String(200), nullable=False, index=True) # Indexed for sort by title
     content = db.Column(db.Text, nullable=False) # Use db.Text for potentially long content
-    # Use db.func.now() for a database-generated default timestamp
-    issue_date = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    # Rendered once when the content changes (see set_content), so reads never run Markdown
+    content_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.String(EXCERPT_LENGTH), nullable=True) # Plaintext preview for list pages
+    # Python-side default: stored in the same text format as the datetimes the keyset cursors and
+    # date filters compare it with (SQLite CURRENT_TIMESTAMP has no microseconds and would sort apart)
+    # Indexed for the default newest-first sort and date range filters
+    issue_date = db.Column(db.DateTime, nullable=False, default=utcnow, index=True)
     # Foreign key linking to the User who published the notice
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     # Foreign key linking to the Department (optional)
@@ -88,15 +118,36 @@ class Notice(db.Model):
     # Use func.now() for database-side timestamp on update
     last_edited_timestamp = db.Column(db.DateTime, nullable=True, onupdate=func.now())
 
+    def set_content(self, content):
+        """Sets the Markdown content and stores its rendered HTML and excerpt."""
+        if content == self.content and self.content_html is not None:
+            return # Unchanged, no need to render again
+        self.content = content
+        self.content_html, self.excerpt = render_markdown(content)
+
     def __repr__(self):
         return f'<Notice {self.title}>'
 
 # Define the Event model
 class Event(db.Model):
+    # Composite indexes for the department/category filters in event_list (sorted by date)
+    # The category index also serves sort by category
+    __table_args__ = (
+        db.Index('ix_event_department_id_event_date', 'department_id', 'event_date'),
+        db.Index('ix_event_category_event_date', 'category', 'event_date'),
+        # Covers the facet counts of the event list (see facets.py), read in group order
+        db.Index('ix_event_department_id_category_event_date', 'department_id', 'category', 'event_date'),
+        # Ids are never reused, archived events keep theirs (see archive.py)
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String(200), nullable=False)
+    title = db.Column(db.String(200), nullable=False, index=True) # Indexed for sort by title
     description = db.Column(db.Text, nullable=False)
-    event_date = db.Column(db.DateTime, nullable=False) # Date and time of the event
+    # Rendered once when the description changes (see set_description)
+    content_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.String(EXCERPT_LENGTH), nullable=True)
+    event_date = db.Column(db.DateTime, nullable=False, index=True) # Date and time of the event, indexed for sorts/filters and upcoming events
     venue = db.Column(db.String(100), nullable=False)
     category = db.Column(db.String(50), nullable=True) # Optional category
     # Foreign key linking to the User who organized the event
@@ -109,6 +160,13 @@ class Event(db.Model):
     last_edited_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # For tracking edits
     last_edited_timestamp = db.Column(db.DateTime, nullable=True, onupdate=func.now()) # Use func.now() for database-side timestamp on update
 
+    def set_description(self, description):
+        """Sets the Markdown description and stores its rendered HTML and excerpt."""
+        if description == self.description and self.content_html is not None:
+            return # Unchanged, no need to render again
+        self.description = description
+        self.content_html, self.excerpt = render_markdown(description)
+
     def __repr__(self):
         return f'<Event {self.title}>'
 
@@ -118,10 +176,159 @@ class MediaFile(db.Model):
     filename = db.Column(db.String(200), nullable=False)
     # We could add a type later if needed ('image', 'video')
     # media_type = db.Column(db.String(20), nullable=False)
+    # The file content is stored once per SHA-256 hash (see media.py), attachments of the same file share it
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    size = db.Column(db.Integer, nullable=True) # Bytes
+    uploaded_at = db.Column(db.DateTime, nullable=True, default=db.func.now())
+    # Thumbnail and preview images, made by `flask media-worker` (see media_jobs.py)
+    # preview_status: None (no preview for this file type), 'pending', 'ready' or 'failed'
+    preview_status = db.Column(db.String(20), nullable=True)
+    thumbnail = db.Column(db.String(100), nullable=True) # Filenames in the media store, set when ready
+    preview = db.Column(db.String(100), nullable=True)
 
     # Foreign Key to link back to the Notice & Event it belongs to
-    notice_id = db.Column(db.Integer, db.ForeignKey('notice.id'), nullable=True)
-    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)
+    # Indexed: detail pages and list pages look attachments up by their notice/event
+    notice_id = db.Column(db.Integer, db.ForeignKey('notice.id'), nullable=True, index=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True, index=True)
+
+    # Preview jobs of this attachment, removed together with it
+    jobs = db.relationship('MediaJob', backref='media_file', lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
         return f'<MediaFile {self.filename}>'
+
+# Define the MediaJob model
+# Queue of preview jobs, claimed and run by `flask media-worker` (see media_jobs.py)
+class MediaJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    media_file_id = db.Column(db.Integer, db.ForeignKey('media_file.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending') # 'pending', 'running' or 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=db.func.now()) # Retries are delayed
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    worker = db.Column(db.String(50), nullable=True) # host:pid of the worker running it
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    # Workers claim the oldest runnable pending job
+    __table_args__ = (db.Index('ix_media_job_status_run_after', 'status', 'run_after'),)
+
+    def __repr__(self):
+        return f'<MediaJob {self.id} {self.status}>'
+
+# Define the ArchivedEvent model
+# Past events moved out of the event table by `flask archive-events` (see archive.py), so the event
+# table and its indexes only hold upcoming and recent events. Same columns, ids are kept.
+# Read-only: the detail page and date-filtered lists still show them, they can't be edited.
+class ArchivedEvent(db.Model):
+    __tablename__ = 'event_archive'
+    __table_args__ = (
+        db.Index('ix_event_archive_department_id_event_date', 'department_id', 'event_date'),
+        db.Index('ix_event_archive_category_event_date', 'category', 'event_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False) # The id the event had
+    title = db.Column(db.String(200), nullable=False, index=True)
+    description = db.Column(db.Text, nullable=False)
+    content_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.String(EXCERPT_LENGTH), nullable=True)
+    event_date = db.Column(db.DateTime, nullable=False, index=True)
+    venue = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(50), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey('department.id'), nullable=True)
+    last_edited_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    last_edited_timestamp = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    organizer = db.relationship('User', foreign_keys=[user_id])
+    last_editor = db.relationship('User', foreign_keys=[last_edited_by_id])
+    department = db.relationship('Department')
+    media_files = db.relationship('ArchivedMediaFile', backref='event', lazy=True, cascade="all, delete-orphan")
+
+    archived = True # Templates hide the edit controls
+
+    def __repr__(self):
+        return f'<ArchivedEvent {self.title}>'
+
+# Define the ArchivedMediaFile model
+# Attachments of archived events, moved together with them (the stored files stay where they are)
+class ArchivedMediaFile(db.Model):
+    __tablename__ = 'media_file_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    filename = db.Column(db.String(200), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    size = db.Column(db.Integer, nullable=True)
+    uploaded_at = db.Column(db.DateTime, nullable=True)
+    preview_status = db.Column(db.String(20), nullable=True)
+    thumbnail = db.Column(db.String(100), nullable=True)
+    preview = db.Column(db.String(100), nullable=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('event_archive.id'), nullable=False, index=True)
+
+    archived = True
+
+    def __repr__(self):
+        return f'<ArchivedMediaFile {self.filename}>'
+
+# Columns shared by Event and ArchivedEvent, in the order EventListing selects them
+EVENT_LISTING_COLUMNS = ['id', 'title', 'excerpt', 'event_date', 'venue', 'category', 'user_id',
+                         'department_id', 'last_edited_by_id', 'last_edited_timestamp',
+                         'description', 'content_html'] # Deferred unless the API asks for the content
+
+# Define the EventListing model
+# Read-only view of the event and event_archive tables together (UNION ALL), mapped like a table so
+# the event_list query builder can filter, sort and paginate it like Event. Only used when a date
+# filter reaches back into the archive (see queries.build_event_query).
+_event_listing = db.select(*[Event.__table__.c[name] for name in EVENT_LISTING_COLUMNS], db.literal(False).label('archived')) \
+    .union_all(db.select(*[ArchivedEvent.__table__.c[name] for name in EVENT_LISTING_COLUMNS], db.literal(True).label('archived'))) \
+    .subquery('event_listing')
+
+class EventListing(db.Model):
+    __table__ = _event_listing
+    __mapper_args__ = {'primary_key': [_event_listing.c.id]}
+
+    organizer = db.relationship('User', primaryjoin='foreign(EventListing.user_id) == User.id', viewonly=True)
+    department = db.relationship('Department', primaryjoin='foreign(EventListing.department_id) == Department.id', viewonly=True)
+    last_editor = db.relationship('User', primaryjoin='foreign(EventListing.last_edited_by_id) == User.id', viewonly=True)
+
+    def __repr__(self):
+        return f'<EventListing {self.title}>'
+
+# Define the ChangeLog model
+# One row per insert, update or delete of a notice, event or attachment, written by SQLite triggers
+# (see migration 80f5793dba05), so bulk statements and `flask archive-events` are recorded too.
+# /api/v1/changes?since=<id> returns the rows after a client's cursor (see changes.py).
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        # Compaction finds the newer changes of the same row
+        db.Index('ix_change_log_entity_entity_id_id', 'entity', 'entity_id', 'id'),
+        # Cursors are ids, they must never be handed out again after compaction
+        {'sqlite_autoincrement': True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False) # 'notice', 'event' or 'media_file'
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False) # 'insert', 'update' or 'delete'
+    # Set by the database, the triggers insert without it
+    changed_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __repr__(self):
+        return f'<ChangeLog {self.id} {self.action} {self.entity} {self.entity_id}>'
+
+# Define the ChangeLogCompaction model
+# One row per `flask compact-change-log` run that removed expired changes. Clients whose cursor is
+# older than compacted_through have missed changes and must download everything again (410 Gone).
+class ChangeLogCompaction(db.Model):
+    __tablename__ = 'change_log_compaction'
+    id = db.Column(db.Integer, primary_key=True)
+    compacted_through = db.Column(db.Integer, nullable=False) # Highest change id removed
+    removed = db.Column(db.Integer, nullable=False, default=0)
+    compacted_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+
+    def __repr__(self):
+        return f'<ChangeLogCompaction through {self.compacted_through}>'
@@ -0,0 +1,322 @@
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadData
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.orm import joinedload, contains_eager, load_only, defer, selectinload
+from models import Notice, Event, Department, MediaFile, ArchivedEvent, EventListing
+
+# Query Builders
+# The list routes and the `flask check-query-plans` command both build their
+# queries here, so the command always checks the exact SQL the pages run.
+#
+# List queries are paginated by keyset (cursor) instead of OFFSET: each page
+# remembers the (sort value, id) of its first and last row, and the next page
+# starts right after that position. There is no COUNT(*) and no OFFSET, so
+# page 500 costs the same index seek as page 1.
+
+# Position of a row in a sorted list. backwards=True means "the page before this row".
+Cursor = namedtuple('Cursor', ['value', 'id', 'backwards'])
+
+def _cursor_serializer():
+    # Signed so clients can't hand-craft cursors, opaque so the format can change
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='list-cursor')
+
+def encode_cursor(value, row_id, sort_key, backwards=False):
+    """Encodes a list position as an opaque URL-safe token."""
+    if isinstance(value, datetime):
+        value = {'dt': value.isoformat()}
+    return _cursor_serializer().dumps([sort_key, value, row_id, backwards])
+
+def decode_cursor(token, sort_key):
+    """Decodes a token from encode_cursor.
+
+    Returns None if the token is invalid or was made for a different sort (sort_key).
+    """
+    try:
+        token_sort_key, value, row_id, backwards = _cursor_serializer().loads(token)
+    except (BadData, TypeError, ValueError):
+        return None
+    if token_sort_key != sort_key or not isinstance(row_id, int):
+        return None
+    if isinstance(value, dict):
+        try:
+            value = datetime.fromisoformat(value['dt'])
+        except (KeyError, TypeError, ValueError):
+            return None
+    return Cursor(value, row_id, bool(backwards))
+
+def apply_keyset(query, order_column, id_column, descending, cursor=None, nullable=False):
+    """Orders the query by (order_column, id_column) and starts it after the cursor position.
+
+    The returned query yields (item, sort_value) rows, the sort value is needed to build the next cursor.
+    SQLite sorts NULLs first in ascending order, nullable columns get an extra branch for them.
+    """
+    if cursor and cursor.backwards:
+        # Walk the list in the opposite direction, fetch_page puts the rows back in order
+        descending = not descending
+
+    if cursor:
+        value, row_id = cursor.value, cursor.id
+        if descending:
+            if value is None:
+                # Only NULLs come after a NULL in descending order
+                condition = and_(order_column.is_(None), id_column < row_id)
+            else:
+                # Written as a range on order_column so the index can seek to it
+                condition = and_(order_column <= value, or_(order_column < value, id_column < row_id))
+                if nullable:
+                    condition = or_(condition, order_column.is_(None))
+        else:
+            if value is None:
+                condition = or_(and_(order_column.is_(None), id_column > row_id), order_column.isnot(None))
+            else:
+                condition = and_(order_column >= value, or_(order_column > value, id_column > row_id))
+        query = query.filter(condition)
+
+    # id breaks ties so every row has exactly one position in the list
+    if descending:
+        query = query.order_by(order_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(order_column.asc(), id_column.asc())
+    return query.add_columns(order_column)
+
+class KeysetPage:
+    """One page of a keyset paginated list, with cursors for the neighbouring pages."""
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def fetch_page(query, sort_key, cursor=None, per_page=10):
+    """Fetches one page from a query built with apply_keyset.
+
+    sort_key identifies the sort (e.g. 'date:desc') so cursors can't be reused across sorts.
+    """
+    # One extra row tells us whether there is another page, without a COUNT(*)
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    backwards = bool(cursor and cursor.backwards)
+    if backwards:
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    next_cursor = prev_cursor = None
+    if rows:
+        first_item, first_value = rows[0]
+        last_item, last_value = rows[-1]
+        if backwards:
+            # We came from the next page, so it exists; the extra row means there is an earlier one
+            has_prev, has_next = has_more, True
+        else:
+            # Any page reached through a cursor has a previous page
+            has_prev, has_next = cursor is not None, has_more
+        if has_prev:
+            prev_cursor = encode_cursor(first_value, first_item.id, sort_key, backwards=True)
+        if has_next:
+            next_cursor = encode_cursor(last_value, last_item.id, sort_key)
+    return KeysetPage(items, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+def build_notice_query(department_id=None, start_date=None, end_date=None, sort_by='date', sort_order='desc', cursor=None, with_content=False):
+    """Builds the filtered, sorted and keyset-positioned notice_list query.
+
+    Returns (query, sort_by, sort_order) with invalid sort values replaced by the defaults.
+    The query yields (notice, sort_value) rows, see fetch_page.
+    with_content=True also loads the content columns (used by the API).
+    """
+    # The list template shows the publisher and last editor names, load them in the same SELECT
+    query = Notice.query.options(
+        joinedload(Notice.publisher),
+        joinedload(Notice.last_editor)
+    )
+    if not with_content:
+        # It only shows the excerpt, so the full content columns are not loaded
+        query = query.options(defer(Notice.content), defer(Notice.content_html))
+
+    # Apply Filters
+    if start_date:
+        query = query.filter(Notice.issue_date >= start_date)
+    if end_date:
+        # To include notices ON the end date, filter for less than the *next* day
+        query = query.filter(Notice.issue_date < end_date + timedelta(days=1))
+    if department_id:
+        query = query.filter(Notice.department_id == department_id)
+
+    # Apply Sorting (Newest first by default)
+    nullable = False
+    if sort_by == 'title':
+        order_column = Notice.title
+    elif sort_by == 'department':
+        # Join with Department table to sort by department name
+        # outerjoin is safer if a notice might not have a department
+        query = query.outerjoin(Department).options(contains_eager(Notice.department)) # Reuse the join to load the department
+        order_column = Department.name
+        nullable = True # Notices without a department have no name to sort by
+    else: # Default to sorting by date
+        sort_by = 'date'
+        order_column = Notice.issue_date
+    if sort_by != 'department':
+        query = query.options(joinedload(Notice.department))
+
+    # Apply sort order (ascending or descending)
+    if sort_order != 'asc':
+        sort_order = 'desc' # Default to desc if invalid value passed
+
+    query = apply_keyset(query, order_column, Notice.id, sort_order == 'desc', cursor=cursor, nullable=nullable)
+    return query, sort_by, sort_order
+
+def build_event_query(department_id=None, start_date=None, end_date=None, category=None, sort_by='date', sort_order='asc', cursor=None, with_content=False, include_archive=False):
+    """Builds the filtered, sorted and keyset-positioned event_list query.
+
+    Returns (query, sort_by, sort_order) with invalid sort values replaced by the defaults.
+    The query yields (event, sort_value) rows, see fetch_page.
+    with_content=True also loads the description columns (used by the API).
+    include_archive=True lists archived events too (EventListing rows instead of Event rows),
+    see archive_reaches() for when a date filter needs them.
+    """
+    model = EventListing if include_archive else Event
+    # The list template shows the organizer name, load it in the same SELECT
+    query = model.query.options(joinedload(model.organizer))
+    if not with_content:
+        # The description is not shown on the list, so it is not loaded
+        query = query.options(defer(model.description), defer(model.content_html))
+
+    # Apply Filters
+    if start_date:
+        # Filter events where event_date is on or after start_date
+        query = query.filter(model.event_date >= start_date)
+    if end_date:
+        # Filter events where event_date is before the day *after* end_date
+        query = query.filter(model.event_date < end_date + timedelta(days=1))
+    if department_id:
+        query = query.filter(model.department_id == department_id)
+    if category:
+        query = query.filter(model.category == category)
+
+    # Apply Sorting (Upcoming first by default)
+    nullable = False
+    if sort_by == 'title':
+        order_column = model.title
+    elif sort_by == 'category':
+        order_column = model.category
+        nullable = True # Category is optional
+    elif sort_by == 'department':
+        query = query.outerjoin(Department, model.department_id == Department.id).options(contains_eager(model.department)) # Join needed for sorting, also loads the department
+        order_column = Department.name
+        nullable = True
+    else: # Default to sorting by event date
+        sort_by = 'date'
+        order_column = model.event_date
+    if sort_by != 'department':
+        query = query.options(joinedload(model.department))
+
+    # Apply sort order
+    if sort_order != 'desc':
+        sort_order = 'asc' # Default to asc if invalid value
+
+    query = apply_keyset(query, order_column, model.id, sort_order == 'desc', cursor=cursor, nullable=nullable)
+    return query, sort_by, sort_order
+
+def notice_detail_query():
+    """Notice query for the detail page, with everything the template shows loaded up front."""
+    return Notice.query.options(
+        joinedload(Notice.publisher),
+        joinedload(Notice.last_editor),
+        joinedload(Notice.department),
+        selectinload(Notice.media_files) # Attachments in one extra query
+    )
+
+def event_detail_query():
+    """Event query for the detail page, with everything the template shows loaded up front."""
+    return Event.query.options(
+        joinedload(Event.organizer),
+        joinedload(Event.last_editor),
+        joinedload(Event.department),
+        selectinload(Event.media_files) # Attachments in one extra query
+    )
+
+def ready_previews_count(foreign_key, parent_id):
+    """Correlated count of the parent's attachments with a finished preview (the page shows them once ready)."""
+    return select(func.count(MediaFile.id)) \
+        .where(foreign_key == parent_id, MediaFile.preview_status == 'ready') \
+        .scalar_subquery().label('ready_previews')
+
+def notice_version_query(notice_id):
+    """Only the columns that change when the notice does, for conditional GET (see http_cache)."""
+    return Notice.query.with_entities(Notice.id, Notice.issue_date, Notice.last_edited_timestamp, ready_previews_count(MediaFile.notice_id, Notice.id)) \
+        .filter(Notice.id == notice_id)
+
+def event_version_query(event_id):
+    """Only the columns that change when the event does, for conditional GET (see http_cache)."""
+    # Events have no creation timestamp, event_date helps tell apart an event that reuses a deleted one's id
+    return Event.query.with_entities(Event.id, Event.event_date, Event.last_edited_timestamp, ready_previews_count(MediaFile.event_id, Event.id)) \
+        .filter(Event.id == event_id)
+
+def archived_event_version_query(event_id):
+    """event_version_query for an archived event (detail page fallback)."""
+    # archived_at: the page changes (no edit controls) when the event moves to the archive
+    return ArchivedEvent.query.with_entities(ArchivedEvent.id, ArchivedEvent.event_date, ArchivedEvent.last_edited_timestamp, ArchivedEvent.archived_at) \
+        .filter(ArchivedEvent.id == event_id)
+
+def archived_event_detail_query():
+    """event_detail_query for an archived event."""
+    return ArchivedEvent.query.options(
+        joinedload(ArchivedEvent.organizer),
+        joinedload(ArchivedEvent.last_editor),
+        joinedload(ArchivedEvent.department),
+        selectinload(ArchivedEvent.media_files)
+    )
+
+def attachment_previews(parent_column, parent_ids):
+    """First attachment with a preview (ready or not) of each notice/event on a list page.
+
+    parent_column is MediaFile.notice_id or MediaFile.event_id. Returns {parent id: row}, one query.
+    """
+    if not parent_ids:
+        return {}
+    rows = MediaFile.query.with_entities(
+        parent_column.label('parent_id'), MediaFile.id, MediaFile.filename, MediaFile.content_hash, MediaFile.preview_status
+    ).filter(parent_column.in_(parent_ids), MediaFile.preview_status.isnot(None)).order_by(MediaFile.id)
+    previews = {}
+    for row in rows:
+        previews.setdefault(row.parent_id, row)
+    return previews
+
+def recent_notices_query(limit=5):
+    """Most recent notices for the dashboard."""
+    # The dashboard only shows title and date, skip the (large) content columns
+    return Notice.query.options(load_only(Notice.id, Notice.title, Notice.issue_date)) \
+        .order_by(Notice.issue_date.desc()).limit(limit)
+
+def upcoming_events_query(limit=5):
+    """Next upcoming events for the dashboard."""
+    return Event.query.options(load_only(Event.id, Event.title, Event.event_date)) \
+        .filter(Event.event_date >= datetime.now()).order_by(Event.event_date.asc()).limit(limit)
+
+def notice_facet_query(start_date=None, end_date=None):
+    """(department_id, count) of the notices in the date range, one GROUP BY (see facets.py)."""
+    query = Notice.query.with_entities(Notice.department_id, func.count(Notice.id))
+    if start_date:
+        query = query.filter(Notice.issue_date >= start_date)
+    if end_date:
+        query = query.filter(Notice.issue_date < end_date + timedelta(days=1))
+    return query.group_by(Notice.department_id)
+
+def event_facet_query(start_date=None, end_date=None, include_archive=False):
+    """(department_id, category, count) of the events in the date range, one GROUP BY (see facets.py)."""
+    model = EventListing if include_archive else Event
+    query = model.query.with_entities(model.department_id, model.category, func.count(model.id))
+    if start_date:
+        query = query.filter(model.event_date >= start_date)
+    if end_date:
+        query = query.filter(model.event_date < end_date + timedelta(days=1))
+    return query.group_by(model.department_id, model.category)
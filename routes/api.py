@@ -0,0 +1,301 @@
+import json
+from functools import wraps
+from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, stream_with_context, url_for
+from flask_login import current_user
+from models import Notice, Event, MediaFile
+from caches import department_cache # Cached department catalog
+from forms import EventForm
+from queries import build_notice_query, build_event_query, decode_cursor, fetch_page, notice_detail_query, event_detail_query
+from queries import archived_event_detail_query # Events moved to the archive
+from archive import archive_reaches # Date filters that reach back into the archive
+from changes import changes_since, latest_change_id, compaction_horizon, ACTIONS # Delta sync (change log)
+
+# Define Blueprint
+# Read-only JSON API for the signage screens and the mobile app, versioned by prefix
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Page size for the JSON list endpoints (?limit=...)
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Rows fetched from the database per batch when streaming NDJSON
+STREAM_BATCH_SIZE = 1000
+# Change log rows per /changes response (?limit=...)
+DEFAULT_CHANGES_LIMIT = 100
+MAX_CHANGES_LIMIT = 1000
+
+class ApiError(Exception):
+    """Invalid request, turned into a JSON error response with the given status."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify(error=error.message), error.status
+
+def api_login_required(f):
+    """Like login_required, but answers 401 JSON instead of redirecting to the login page."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify(error='Authentication required.'), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+# Serializable Fields
+# field name -> function(item) returning its JSON value. Only these can be requested with ?fields=
+NOTICE_FIELDS = {
+    'id': lambda notice: notice.id,
+    'title': lambda notice: notice.title,
+    'content': lambda notice: notice.content, # Markdown source
+    'content_html': lambda notice: notice.content_html,
+    'excerpt': lambda notice: notice.excerpt,
+    'issue_date': lambda notice: _isoformat(notice.issue_date),
+    'department_id': lambda notice: notice.department_id,
+    'department': lambda notice: notice.department.name if notice.department else None,
+    'publisher': lambda notice: notice.publisher.username,
+    'last_editor': lambda notice: notice.last_editor.username if notice.last_editor else None,
+    'last_edited_timestamp': lambda notice: _isoformat(notice.last_edited_timestamp),
+}
+NOTICE_DEFAULT_FIELDS = ['id', 'title', 'excerpt', 'issue_date', 'department_id', 'department', 'publisher', 'last_edited_timestamp']
+
+EVENT_FIELDS = {
+    'id': lambda event: event.id,
+    'title': lambda event: event.title,
+    'description': lambda event: event.description, # Markdown source
+    'content_html': lambda event: event.content_html,
+    'excerpt': lambda event: event.excerpt,
+    'event_date': lambda event: _isoformat(event.event_date),
+    'venue': lambda event: event.venue,
+    'category': lambda event: event.category,
+    'department_id': lambda event: event.department_id,
+    'department': lambda event: event.department.name if event.department else None,
+    'organizer': lambda event: event.organizer.username,
+    'last_editor': lambda event: event.last_editor.username if event.last_editor else None,
+    'last_edited_timestamp': lambda event: _isoformat(event.last_edited_timestamp),
+    'archived': lambda event: bool(getattr(event, 'archived', False)), # Moved to the archive (read-only)
+}
+EVENT_DEFAULT_FIELDS = ['id', 'title', 'excerpt', 'event_date', 'venue', 'category', 'department_id', 'department', 'organizer', 'last_edited_timestamp', 'archived']
+
+MEDIA_FIELDS = {
+    'id': lambda media: media.id,
+    'filename': lambda media: media.filename,
+    'content_type': lambda media: media.content_type,
+    'size': lambda media: media.size,
+    'notice_id': lambda media: media.notice_id,
+    'event_id': lambda media: media.event_id,
+    'url': lambda media: url_for('media.media_download', content_hash=media.content_hash, filename=media.filename) if media.content_hash else None,
+    'preview_status': lambda media: media.preview_status,
+    'uploaded_at': lambda media: _isoformat(media.uploaded_at),
+}
+
+# Sorts accepted by build_notice_query / build_event_query
+NOTICE_SORTS = ['date', 'title', 'department']
+EVENT_SORTS = ['date', 'title', 'category', 'department']
+
+# Fields backed by the large text columns the list queries skip by default
+CONTENT_FIELDS = {'content', 'description', 'content_html'}
+
+# Parameter Parsing
+# Same filters and sorts as notice_list/event_list, but invalid values are errors instead of warnings
+def parse_fields(allowed, default):
+    """Parses ?fields=a,b,c against the allowed field names. id is always included."""
+    value = request.args.get('fields')
+    if not value:
+        return list(default)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ApiError(f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(allowed)}.')
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+def parse_date(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ApiError(f'Invalid {name}, use YYYY-MM-DD.')
+
+def parse_list_filters():
+    """Parses the department/date filters shared by both list endpoints."""
+    department_id = request.args.get('department_id', default=None, type=int)
+    if department_id == 0:
+        department_id = None
+    if department_id and not department_cache.get(department_id):
+        raise ApiError(f'Department ID {department_id} not found.', 404)
+    return {
+        'department_id': department_id,
+        'start_date': parse_date('start_date'),
+        'end_date': parse_date('end_date'),
+    }
+
+def parse_cursor(sort_by, sort_order):
+    """Decodes ?after= / ?before= (tokens from next_cursor / prev_cursor)."""
+    token = request.args.get('before') or request.args.get('after')
+    if not token:
+        return None
+    cursor = decode_cursor(token, f'{sort_by}:{sort_order}')
+    if cursor is None:
+        raise ApiError('Invalid or expired cursor for this sort.')
+    return cursor
+
+def parse_limit():
+    limit = request.args.get('limit', default=DEFAULT_LIMIT, type=int)
+    return max(1, min(limit, MAX_LIMIT))
+
+def serialize(item, fields, field_functions):
+    return {name: field_functions[name](item) for name in fields}
+
+def parse_sort(sort_options, default_sort_order):
+    sort_by = request.args.get('sort_by', 'date')
+    sort_order = request.args.get('sort_order', default_sort_order)
+    if sort_by not in sort_options:
+        raise ApiError(f'Invalid sort_by. Available: {", ".join(sort_options)}.')
+    if sort_order not in ('asc', 'desc'):
+        raise ApiError('Invalid sort_order, use asc or desc.')
+    return sort_by, sort_order
+
+def list_response(build_query, filters, sort_options, default_sort_order, field_functions, default_fields):
+    """Shared body of the list endpoints: one JSON page, or the whole result set as NDJSON."""
+    fields = parse_fields(field_functions, default_fields)
+    sort_by, sort_order = parse_sort(sort_options, default_sort_order)
+    cursor = parse_cursor(sort_by, sort_order)
+    # The large text columns are only loaded when a requested field needs them
+    with_content = any(name in CONTENT_FIELDS for name in fields)
+    query, sort_by, sort_order = build_query(**filters, sort_by=sort_by, sort_order=sort_order, cursor=cursor, with_content=with_content)
+
+    if request.args.get('format') == 'ndjson':
+        return ndjson_response(query, fields, field_functions)
+
+    page = fetch_page(query, f'{sort_by}:{sort_order}', cursor=cursor, per_page=parse_limit())
+    return jsonify(
+        items=[serialize(item, fields, field_functions) for item in page.items],
+        sort_by=sort_by,
+        sort_order=sort_order,
+        next_cursor=page.next_cursor, # Pass as ?after= for the next page
+        prev_cursor=page.prev_cursor # Pass as ?before= for the previous page
+    )
+
+def ndjson_response(query, fields, field_functions):
+    """Streams every row of the query as one JSON object per line.
+
+    Rows are fetched STREAM_BATCH_SIZE at a time with yield_per and written out as they arrive,
+    so memory use doesn't grow with the size of the export.
+    """
+    def generate():
+        lines = []
+        for item, _ in query.yield_per(STREAM_BATCH_SIZE):
+            lines.append(json.dumps(serialize(item, fields, field_functions)))
+            if len(lines) >= STREAM_BATCH_SIZE:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+# API Routes
+
+# Route -> /api/v1/notices?department_id=&start_date=&end_date=&sort_by=&sort_order=&fields=&limit=&after=|before=&format=ndjson
+@api_bp.route('/notices')
+@api_login_required
+def notice_list():
+    """Notices with the notice_list filters and sorts (newest first by default)."""
+    return list_response(build_notice_query, parse_list_filters(), NOTICE_SORTS, 'desc', NOTICE_FIELDS, NOTICE_DEFAULT_FIELDS)
+
+# Route -> /api/v1/notices/123?fields=
+@api_bp.route('/notices/<int:notice_id>')
+@api_login_required
+def notice_detail(notice_id):
+    fields = parse_fields(NOTICE_FIELDS, list(NOTICE_FIELDS))
+    notice = notice_detail_query().filter(Notice.id == notice_id).first()
+    if notice is None:
+        raise ApiError('Notice not found.', 404)
+    return jsonify(serialize(notice, fields, NOTICE_FIELDS))
+
+# Route -> /api/v1/events?...&category=
+@api_bp.route('/events')
+@api_login_required
+def event_list():
+    """Events with the event_list filters and sorts (upcoming first by default)."""
+    filters = parse_list_filters()
+    category = request.args.get('category') or None
+    categories = [choice[0] for choice in EventForm.category.kwargs.get('choices', []) if choice[0]]
+    if category and category not in categories:
+        raise ApiError(f'Unknown category. Available: {", ".join(categories)}.')
+    filters['category'] = category
+    # Same as event_list: archived events are listed when the date filter reaches back to them
+    filters['include_archive'] = archive_reaches(filters['start_date'], filters['end_date'])
+    return list_response(build_event_query, filters, EVENT_SORTS, 'asc', EVENT_FIELDS, EVENT_DEFAULT_FIELDS)
+
+# Route -> /api/v1/events/123?fields=
+@api_bp.route('/events/<int:event_id>')
+@api_login_required
+def event_detail(event_id):
+    fields = parse_fields(EVENT_FIELDS, list(EVENT_FIELDS))
+    event = event_detail_query().filter(Event.id == event_id).first()
+    if event is None:
+        # Archived events keep their ids, like the event detail page
+        event = archived_event_detail_query().filter_by(id=event_id).first()
+    if event is None:
+        raise ApiError('Event not found.', 404)
+    return jsonify(serialize(event, fields, EVENT_FIELDS))
+
+# Change log entity -> (load the current rows by id, serialized fields)
+CHANGE_ENTITIES = {
+    'notice': (lambda ids: notice_detail_query().filter(Notice.id.in_(ids)), NOTICE_DEFAULT_FIELDS, NOTICE_FIELDS),
+    'event': (lambda ids: event_detail_query().filter(Event.id.in_(ids)), EVENT_DEFAULT_FIELDS, EVENT_FIELDS),
+    'media_file': (lambda ids: MediaFile.query.filter(MediaFile.id.in_(ids)), list(MEDIA_FIELDS), MEDIA_FIELDS),
+}
+
+# Route -> /api/v1/changes?since=&limit=
+@api_bp.route('/changes')
+@api_login_required
+def change_list():
+    """Notices, events and attachments changed after the ?since= cursor, deleted ones as tombstones.
+
+    Without since, only the current cursor is returned: take it, download the lists, then poll with it.
+    """
+    since = request.args.get('since')
+    if not since:
+        return jsonify(changes=[], cursor=latest_change_id(), has_more=False)
+    try:
+        since = int(since)
+    except ValueError:
+        raise ApiError('Invalid since, pass the cursor of the previous response.')
+    if since < compaction_horizon():
+        raise ApiError('Changes after this cursor were compacted, download the lists again and continue with a new cursor.', 410)
+    limit = max(1, min(request.args.get('limit', default=DEFAULT_CHANGES_LIMIT, type=int), MAX_CHANGES_LIMIT))
+    rows, cursor, has_more = changes_since(since, limit)
+
+    # The current version of every changed row that still exists, one query per entity type
+    items = {}
+    for entity, (load, fields, field_functions) in CHANGE_ENTITIES.items():
+        ids = [row.entity_id for row in rows if row.entity == entity and row.action != 'delete']
+        if ids:
+            for item in load(ids):
+                items[(entity, item.id)] = serialize(item, fields, field_functions)
+
+    changes = []
+    for row in rows:
+        item = items.get((row.entity, row.entity_id))
+        # Rows deleted after this change (reported by a later change) are tombstones already
+        change = {'change_id': row.id, 'type': row.entity, 'id': row.entity_id,
+                  'action': ACTIONS[row.action] if item is not None else 'deleted'}
+        if item is not None:
+            change['item'] = item
+        changes.append(change)
+    return jsonify(
+        changes=changes,
+        cursor=cursor, # Pass as ?since= for the next poll
+        has_more=has_more # More changes are waiting, poll again right away
+    )
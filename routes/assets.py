@@ -0,0 +1,40 @@
+import os
+import mimetypes
+from flask import Blueprint, send_file, request, current_app, abort
+from werkzeug.security import safe_join
+from assets import dist_root, ENCODINGS
+
+# Define Blueprint
+# Fingerprinted static files built by `flask build-assets` (see assets.py)
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+# Route -> /assets/css/theme.3f2a1b9c0d4e.css
+@assets_bp.route('/<path:filename>')
+def asset(filename):
+    """Sends a fingerprinted file, precompressed (brotli or gzip) when the browser accepts it."""
+    path = safe_join(dist_root(), filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    # Pick the smallest variant the browser accepts
+    encoding = None
+    for token, suffix in ENCODINGS.items():
+        if request.accept_encodings.quality(token) > 0 and os.path.isfile(path + suffix):
+            encoding, path = token, path + suffix
+            break
+    # The content type of the original, not of the .gz/.br file
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=f'{filename}-{encoding or "identity"}', # The name contains the content hash
+        max_age=current_app.config['ASSET_CACHE_MAX_AGE'],
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    # Shared caches must keep the variants apart
+    response.vary.add('Accept-Encoding')
+    # Same content for everyone, and never changes for this URL: no revalidation on reload
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
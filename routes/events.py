@@ -1,11 +1,20 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, abort
 from flask_login import login_required, current_user
 from app import db
-from models import Event, Department, User # Import Event model
+from models import MediaFile, Event, Department, User # Import Event model
+from caches import department_cache # Cached department catalog
 from forms import EventForm # Import Event form
 from decorators import publisher_required, admin_required # Import decorators # Adjust import if decorators move
-from datetime import datetime, timedelta
-from sqlalchemy import asc, desc # Add asc, desc, datetime, timedelta
+from datetime import datetime
+from queries import build_event_query, decode_cursor, fetch_page, event_detail_query, event_version_query, attachment_previews # Shared list query builder and keyset pagination
+from queries import archived_event_detail_query, archived_event_version_query # Detail page of archived events
+from archive import archive_reaches # Past events moved out of the event table
+from feeds import make_feed_key # Calendar feed link
+from http_cache import make_validators, not_modified, add_validators, newest # Conditional GET (ETag / Last-Modified)
+from facets import event_facets # Counts next to the filter options
+from media import attach_uploads # Attachments (content-addressed file store)
+from live_updates import publish_event # Pushes the change to open list pages
+from sqlalchemy.sql import func
 
 # Define Blueprint
 event_bp = Blueprint('event', __name__, url_prefix='/events')
@@ -33,16 +42,11 @@ def event_list():
     sort_by = request.args.get('sort_by', 'date') # Default sort by event date
     sort_order = request.args.get('sort_order', 'asc') # Default ascending (upcoming first)
 
-    # --- Build Base Query ---
-    query = Event.query
-
-    # --- Apply Filters ---
+    # --- Parse Filters ---
     start_date = None
     if start_date_str:
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            # Filter events where event_date is on or after start_date
-            query = query.filter(Event.event_date >= start_date)
         except ValueError:
             flash('Invalid start date format. Please use YYYY-MM-DD.', 'warning')
             start_date_str = None
@@ -51,57 +55,72 @@ def event_list():
     if end_date_str:
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            # Filter events where event_date is before the day *after* end_date
-            query = query.filter(Event.event_date < end_date + timedelta(days=1))
         except ValueError:
             flash('Invalid end date format. Please use YYYY-MM-DD.', 'warning')
             end_date_str = None
 
     if department_id:
-        dept_exists = Department.query.get(department_id)
-        if dept_exists:
-            query = query.filter(Event.department_id == department_id)
-        else:
+        dept_exists = department_cache.get(department_id) # Cached, no query
+        if not dept_exists:
             flash(f'Department ID {department_id} not found.', 'warning')
             department_id = None
 
-    if category: # Filter by category if provided
-         query = query.filter(Event.category == category)
-
-    # --- Apply Sorting ---
-    if sort_by == 'title':
-        order_column = Event.title
-    elif sort_by == 'category':
-        order_column = Event.category
-    elif sort_by == 'department':
-        query = query.outerjoin(Department) # Join needed for sorting
-        order_column = Department.name
-    else: # Default to sorting by event date
-        sort_by = 'date'
-        order_column = Event.event_date
-
-    # Apply sort order
-    if sort_order == 'desc':
-        query = query.order_by(desc(order_column))
-    else:
-        sort_order = 'asc' # Default to asc if invalid value
-        query = query.order_by(asc(order_column))
-
     # --- Pagination ---
-    page = request.args.get('page', 1, type=int)
+    # Keyset pagination: ?after=<token> / ?before=<token> instead of page numbers (no COUNT, no OFFSET)
+    sort_key = f'{sort_by}:{sort_order}'
+    cursor = None
+    if request.args.get('before'):
+        cursor = decode_cursor(request.args['before'], sort_key)
+    elif request.args.get('after'):
+        cursor = decode_cursor(request.args['after'], sort_key)
+
+    # Archived events are only read when the date filter reaches back to them
+    include_archive = archive_reaches(start_date, end_date)
+
+    # --- Build Filtered, Sorted and Positioned Query (shared with `flask check-query-plans`) ---
+    query, sort_by, sort_order = build_event_query(
+        department_id=department_id,
+        start_date=start_date,
+        end_date=end_date,
+        category=category,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor,
+        include_archive=include_archive
+    )
+
     try:
-        pagination = query.paginate(page=page, per_page=10, error_out=False)
+        pagination = fetch_page(query, f'{sort_by}:{sort_order}', cursor=cursor, per_page=10)
     except Exception as e:
         flash(f'Error retrieving events: {e}', 'danger')
         pagination = None
-        events = []
     if pagination:
         events = pagination.items
     else:
         events = []
 
+    # Thumbnail of each row's first image/PDF attachment (one query for the page)
+    previews = attachment_previews(MediaFile.event_id, [event.id for event in events])
+    # Events per department and per category in the date range (one cached GROUP BY), shown in the filter panel
+    facets = event_facets(start_date, end_date, department_id, category, include_archive)
+    # Conditional GET: the page is identified by its rows and the cursors to its neighbours
+    validators = None
+    if pagination:
+        validators = make_validators(
+            sorted(facets.departments.items(), key=repr), # The counts are part of the page
+            sorted(facets.categories.items(), key=repr),
+            [(row_id, preview.content_hash, preview.preview_status) for row_id, preview in sorted(previews.items())],
+            [(event.id, event.event_date, event.last_edited_timestamp) for event in events],
+            pagination.prev_cursor,
+            pagination.next_cursor,
+            last_modified=newest(*[event.last_edited_timestamp for event in events]) # event_date is not a modification time
+        )
+        response = not_modified(validators)
+        if response:
+            return response
+
     # --- Get Data for Filter Form ---
-    departments = Department.query.order_by(Department.name).all() if pagination else []
+    departments = department_cache.all() if pagination else []
     # Get distinct categories currently used in events (or use predefined list)
     # Option 1: Query distinct categories from DB (might be slow on large tables)
     # categories = db.session.query(Event.category).distinct().order_by(Event.category).all()
@@ -120,23 +139,44 @@ def event_list():
         'sort_order': sort_order
     }
 
-    return render_template(
+    page = render_template(
         'event_list.html',
         title='Events',
         events=events,
+        previews=previews, # Attachment thumbnails by event id
         pagination=pagination,
         departments=departments,
         categories=categories, # Pass categories for filter dropdown
-        current_params=current_params
+        facets=facets, # Item counts per department and category
+        current_params=current_params,
+        feed_key=make_feed_key(current_user) # For the calendar feed link
     )
+    return add_validators(page, validators) if validators else page
 
 # Route -> /events/123
 @event_bp.route('/<int:event_id>')
 @login_required
 def event_detail(event_id):
     """Displays the details of a single event."""
-    event = Event.query.get_or_404(event_id)
-    return render_template('event_detail.html', title=event.title, event=event)
+    # Check the version first (a few small columns), answer 304 if the browser already has it
+    version = event_version_query(event_id).first()
+    archived = version is None
+    if archived:
+        # Moved to the archive by `flask archive-events`, links to it keep working
+        version = archived_event_version_query(event_id).first_or_404()
+    validators = make_validators(
+        tuple(version),
+        archived,
+        last_modified=version.last_edited_timestamp, # None until the event is first edited, the ETag still works
+        with_forms=not archived # Delete button form
+    )
+    response = not_modified(validators)
+    if response:
+        return response
+
+    detail_query = archived_event_detail_query() if archived else event_detail_query()
+    event = detail_query.get_or_404(event_id) # Organizer, last editor and department joined in
+    return add_validators(render_template('event_detail.html', title=event.title, event=event), validators)
 
 # Route -> /events/new
 @event_bp.route('/new', methods=['GET', 'POST'])
@@ -148,19 +188,21 @@ def event_create():
     if form.validate_on_submit():
         event = Event(
             title=form.title.data,
-            description=form.description.data,
             event_date=form.event_date.data,
             venue=form.venue.data,
             category=form.category.data,
             user_id=current_user.id # Set the organizer to the current user
         )
+        event.set_description(form.description.data) # Also stores the rendered HTML and excerpt
         if form.department_id.data and form.department_id.data > 0:
             event.department_id = form.department_id.data
         else:
             event.department_id = None
+        attach_uploads(event, form.attachments.data) # Streams the files to the store
 
         db.session.add(event)
         db.session.commit()
+        publish_event(event, 'created') # After the commit, browsers may fetch it right away
         flash('Your event has been posted!', 'success')
         return redirect(url_for('event.event_list')) # Use namespaced endpoint
 
@@ -181,7 +223,7 @@ def event_edit(event_id):
 
     if form.validate_on_submit():
         event.title = form.title.data
-        event.description = form.description.data
+        event.set_description(form.description.data) # Re-renders only if the description changed
         event.event_date = form.event_date.data
         event.venue = form.venue.data
         event.category = form.category.data
@@ -192,8 +234,12 @@ def event_edit(event_id):
 
         # Track Edit
         event.last_edited_by_id = current_user.id
+        if attach_uploads(event, form.attachments.data):
+            # New attachments alone don't update the event row, mark it edited so its ETag changes
+            event.last_edited_timestamp = func.now()
 
         db.session.commit()
+        publish_event(event, 'updated')
         flash('Your event has been updated!', 'success')
         return redirect(url_for('event.event_detail', event_id=event.id)) # Use namespaced endpoint
 
@@ -211,8 +257,10 @@ def event_delete(event_id):
         abort(403)
 
     # Cascade delete should handle associated MediaFiles automatically
+    # The stored files may be shared with other attachments, `flask gc-media` removes unused ones
 
     db.session.delete(event)
     db.session.commit()
+    publish_event(event, 'deleted')
     flash('Event has been deleted!', 'success')
     return redirect(url_for('event.event_list')) # Use namespaced endpoint
@@ -0,0 +1,178 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, request, current_app, abort, stream_with_context, url_for
+from flask_login import current_user
+from app import db
+from models import Notice, Event, User
+from caches import department_cache # Cached department catalog
+from forms import EventForm
+from feeds import load_feed_key, vevent_cache, event_to_vevent, ics_line, ICS_HEADER, ICS_FOOTER
+from feeds import atom_entry_cache, rss_item_cache, notice_to_atom_entry, notice_to_rss_item, atom_document, rss_document, notice_updated
+from http_cache import make_validators, not_modified, add_validators, newest # Conditional GET (ETag / Last-Modified)
+
+# Define Blueprint
+# Subscribable feeds, the URLs carry a feed key (?key=...) for readers that can't log in
+feeds_bp = Blueprint('feeds', __name__, url_prefix='/feeds')
+
+# Columns serialized into a VEVENT (see feeds.event_to_vevent)
+EVENT_FEED_COLUMNS = (Event.id, Event.title, Event.description, Event.event_date, Event.venue, Event.category, Event.last_edited_timestamp)
+# Columns serialized into an Atom entry / RSS item (see feeds.notice_to_atom_entry)
+NOTICE_FEED_COLUMNS = (Notice.id, Notice.title, Notice.excerpt, Notice.content_html, Notice.issue_date,
+                       Notice.last_edited_timestamp, Notice.department_id, User.username.label('publisher'))
+# Newest notices included in a notice feed
+NOTICE_FEED_SIZE = 50
+# Cached entries are looked up and missing ones loaded this many events at a time while streaming
+FEED_BATCH_SIZE = 500
+
+def feed_user():
+    """The logged-in user, or the owner of the ?key= feed key. Aborts with 403 if neither."""
+    if current_user.is_authenticated:
+        return current_user
+    user = load_feed_key(request.args.get('key', ''))
+    if user is None:
+        abort(403)
+    return user
+
+def event_version(row):
+    """Changes whenever the VEVENT of the event has to be serialized again."""
+    return (row.event_date, row.last_edited_timestamp)
+
+def calendar_response(calendar_name, *filters):
+    """Streams an iCalendar document with the events matching filters.
+
+    Only (id, event_date, last_edited_timestamp) are queried for the whole feed. Events whose
+    serialized VEVENT is cached for that version are written from the cache, the rest are
+    loaded in batches, serialized and cached.
+    """
+    feed_user()
+    # Past events stay in the feed for a while, so recent ones don't vanish from calendars right away
+    since = datetime.now() - timedelta(days=current_app.config['FEED_PAST_DAYS'])
+    versions = db.session.query(Event.id, Event.event_date, Event.last_edited_timestamp) \
+        .filter(Event.event_date >= since, *filters) \
+        .order_by(Event.event_date.asc(), Event.id.asc()).all()
+
+    # Conditional GET: calendar apps poll every few minutes, most polls end here
+    validators = make_validators(
+        [(row.id, *event_version(row)) for row in versions],
+        last_modified=newest(*[row.last_edited_timestamp for row in versions])
+    )
+    response = not_modified(validators)
+    if response:
+        return response
+
+    def generate():
+        yield ICS_HEADER + ics_line('X-WR-CALNAME', calendar_name)
+        for start in range(0, len(versions), FEED_BATCH_SIZE):
+            batch = versions[start:start + FEED_BATCH_SIZE]
+            blocks = {}
+            for row in batch:
+                text = vevent_cache.get(row.id, event_version(row))
+                if text is not None:
+                    blocks[row.id] = text
+            missing = [row.id for row in batch if row.id not in blocks]
+            if missing:
+                for row in db.session.query(*EVENT_FEED_COLUMNS).filter(Event.id.in_(missing)):
+                    blocks[row.id] = event_to_vevent(row)
+                    vevent_cache.set(row.id, event_version(row), blocks[row.id])
+            # Events deleted since the version query are simply left out
+            yield ''.join(blocks[row.id] for row in batch if row.id in blocks)
+        yield ICS_FOOTER
+
+    response = Response(stream_with_context(generate()), mimetype='text/calendar')
+    response.headers['Content-Disposition'] = 'inline; filename="events.ics"'
+    return add_validators(response, validators)
+
+def notice_version(row):
+    """Changes whenever the entry of the notice has to be serialized again."""
+    return (row.issue_date, row.last_edited_timestamp)
+
+# Atom and RSS entry serializers and caches, by feed format
+NOTICE_FEED_FORMATS = {
+    'atom': (atom_entry_cache, notice_to_atom_entry, 'application/atom+xml'),
+    'rss': (rss_item_cache, notice_to_rss_item, 'application/rss+xml'),
+}
+
+def notice_feed_response(feed_format, feed_title, site_url, *filters):
+    """Builds an Atom or RSS document with the newest notices matching filters.
+
+    Choosing the entries only queries (id, issue_date, last_edited_timestamp). Entries are
+    serialized from the stored rendered HTML once per notice version and reused from the cache,
+    only notices without a current cached entry are loaded (as plain rows, not ORM objects).
+    """
+    feed_user()
+    entry_cache, serialize, mimetype = NOTICE_FEED_FORMATS[feed_format]
+    versions = db.session.query(Notice.id, Notice.issue_date, Notice.last_edited_timestamp) \
+        .filter(*filters) \
+        .order_by(Notice.issue_date.desc(), Notice.id.desc()).limit(NOTICE_FEED_SIZE).all()
+    updated = newest(*[notice_updated(row) for row in versions])
+
+    # Conditional GET: feed readers poll, most polls end here
+    validators = make_validators([(row.id, *notice_version(row)) for row in versions], last_modified=updated)
+    response = not_modified(validators)
+    if response:
+        return response
+
+    entries = {}
+    for row in versions:
+        text = entry_cache.get(row.id, notice_version(row))
+        if text is not None:
+            entries[row.id] = text
+    missing = [row.id for row in versions if row.id not in entries]
+    if missing:
+        rows = db.session.query(*NOTICE_FEED_COLUMNS).join(User, Notice.user_id == User.id) \
+            .filter(Notice.id.in_(missing))
+        for row in rows:
+            department = department_cache.get(row.department_id) if row.department_id else None
+            entries[row.id] = serialize(row, department.name if department else None)
+            entry_cache.set(row.id, notice_version(row), entries[row.id])
+    # Notices deleted since the version query are simply left out
+    ordered = [entries[row.id] for row in versions if row.id in entries]
+
+    if feed_format == 'atom':
+        feed_url = url_for(request.endpoint, **request.view_args, _external=True) # Without the key
+        document = atom_document(feed_title, feed_url, site_url, updated, ordered)
+    else:
+        document = rss_document(feed_title, site_url, updated, ordered)
+    return add_validators(Response(document, mimetype=mimetype), validators)
+
+# Feed Routes
+
+# Route -> /feeds/events.ics?key=...
+@feeds_bp.route('/events.ics')
+def all_events_calendar():
+    """All events as an iCalendar feed."""
+    return calendar_response('College Events')
+
+# Route -> /feeds/events/department/3.ics?key=...
+@feeds_bp.route('/events/department/<int:department_id>.ics')
+def department_events_calendar(department_id):
+    """Events of one department as an iCalendar feed."""
+    department = department_cache.get(department_id) # Cached, no query
+    if department is None:
+        abort(404)
+    return calendar_response(f'{department.name} Events', Event.department_id == department_id)
+
+# Route -> /feeds/events/category/Workshop.ics?key=...
+@feeds_bp.route('/events/category/<category>.ics')
+def category_events_calendar(category):
+    """Events of one category as an iCalendar feed."""
+    categories = [choice[0] for choice in EventForm.category.kwargs.get('choices', []) if choice[0]]
+    if category not in categories:
+        abort(404)
+    return calendar_response(f'{category} Events', Event.category == category)
+
+# Route -> /feeds/notices.atom?key=... or /feeds/notices.rss?key=...
+@feeds_bp.route('/notices.<any(atom, rss):feed_format>')
+def all_notices_feed(feed_format):
+    """Newest notices as an Atom or RSS feed."""
+    site_url = url_for('notice.notice_list', _external=True)
+    return notice_feed_response(feed_format, 'College Notices', site_url)
+
+# Route -> /feeds/notices/department/3.atom?key=... or .rss
+@feeds_bp.route('/notices/department/<int:department_id>.<any(atom, rss):feed_format>')
+def department_notices_feed(department_id, feed_format):
+    """Newest notices of one department as an Atom or RSS feed."""
+    department = department_cache.get(department_id) # Cached, no query
+    if department is None:
+        abort(404)
+    site_url = url_for('notice.notice_list', department_id=department_id, _external=True)
+    return notice_feed_response(feed_format, f'{department.name} Notices', site_url, Notice.department_id == department_id)
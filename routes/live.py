@@ -0,0 +1,32 @@
+from flask import Blueprint, Response, request, current_app, abort
+from flask_login import login_required
+from live_updates import broadcaster
+
+# Define Blueprint
+# Server-Sent Events stream of notice and event changes (see live_updates.py)
+live_bp = Blueprint('live', __name__, url_prefix='/live')
+
+# Route -> /live/updates
+@live_bp.route('/updates')
+@login_required # Checked once when the stream opens, like the list pages it updates
+def updates():
+    """Streams notice and event updates to an open list page."""
+    config = current_app.config
+    if not config['LIVE_UPDATES_ENABLED']:
+        abort(404)
+    if broadcaster.clients >= config['LIVE_UPDATES_MAX_CLIENTS']:
+        # The browser stops reconnecting on an error status, the page still works without updates
+        return Response('Too many live update streams.', status=503, headers={'Retry-After': '60'})
+    # Not stream_with_context: the request (and its DB session) ends before the first byte is sent
+    response = Response(
+        broadcaster.stream(
+            request.headers.get('Last-Event-ID'), # Sent by the browser when it reconnects
+            heartbeat=config['LIVE_UPDATES_HEARTBEAT'],
+            duration=config['LIVE_UPDATES_STREAM_DURATION'],
+            retry_ms=config['LIVE_UPDATES_RETRY_MS'],
+        ),
+        mimetype='text/event-stream', # Not compressed (see compression.py), every update is flushed
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # nginx: pass updates through instead of buffering them
+    return response
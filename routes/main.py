@@ -1,3 +1,4 @@
+from datetime import datetime
 from flask import Blueprint, render_template
 from flask_login import current_user
 
@@ -7,15 +8,25 @@ main_bp = Blueprint('main', __name__)
 def index():
     if not current_user.is_authenticated:
         return render_template('landing.html')
-    # Show 5 most recent notices and 5 upcoming events
-    from models import Notice, Event
-    from datetime import datetime
-    recent_notices = Notice.query.order_by(Notice.issue_date.desc()).limit(5).all()
-    upcoming_events = Event.query.filter(Event.event_date >= datetime.now()).order_by(Event.event_date.asc()).limit(5).all()
-    return render_template(
-        'index.html',
-        recent_notices=recent_notices,
-        upcoming_events=upcoming_events
-    )
+    # The notice/event cards are the same for everyone, rendered once per data version (see caches.DashboardCache)
+    from caches import data_version, dashboard_cache
+    version = data_version.value # Read before querying, so a write during rendering isn't cached under the new version
+    dashboard_cards = dashboard_cache.get(version)
+    if dashboard_cards is None:
+        # Show 5 most recent notices and 5 upcoming events
+        from queries import recent_notices_query, upcoming_events_query
+        recent_notices = recent_notices_query(5).all()
+        upcoming_events = upcoming_events_query(5).all()
+        dashboard_cards = render_template(
+            '_dashboard_cards.html',
+            recent_notices=recent_notices,
+            upcoming_events=upcoming_events
+        )
+        # The list changes by itself once the first upcoming event starts
+        expires_in = None
+        if upcoming_events:
+            expires_in = (upcoming_events[0].event_date - datetime.now()).total_seconds()
+        dashboard_cache.set(version, dashboard_cards, expires_in=expires_in)
+    return render_template('index.html', dashboard_cards=dashboard_cards)
 
 # Add other main/static routes here later if needed (e.g., about page)
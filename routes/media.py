@@ -0,0 +1,87 @@
+import os
+from flask import Blueprint, send_file, current_app, abort, flash, redirect, url_for
+from flask_login import login_required, current_user
+from sqlalchemy.sql import func
+from app import db
+from models import MediaFile, ArchivedMediaFile
+from media import blob_path, INLINE_CONTENT_TYPES
+from media_jobs import preview_filename, PREVIEW_FORMAT
+
+# Define Blueprint
+# Downloads of attached files, and removing attachments
+media_bp = Blueprint('media', __name__, url_prefix='/media')
+
+# Route -> /media/<sha256>/timetable.pdf
+@media_bp.route('/<string(length=64):content_hash>/<path:filename>')
+@login_required
+def media_download(content_hash, filename):
+    """Sends a stored file. Supports Range requests (resumable downloads, PDF viewers) and conditional GET."""
+    # Only files that are still attached to something are served (attachments of archived events too)
+    attachment = db.session.query(MediaFile.content_type).filter(MediaFile.content_hash == content_hash).first() \
+        or db.session.query(ArchivedMediaFile.content_type).filter(ArchivedMediaFile.content_hash == content_hash).first()
+    path = blob_path(content_hash)
+    if attachment is None or not os.path.isfile(path):
+        abort(404)
+    content_type = attachment.content_type or 'application/octet-stream'
+    # send_file hands the open file to the server (sendfile(2) under Gunicorn, X-Sendfile with USE_X_SENDFILE)
+    response = send_file(
+        path,
+        mimetype=content_type,
+        as_attachment=content_type not in INLINE_CONTENT_TYPES,
+        download_name=filename,
+        conditional=True, # 206 for Range requests, 304 for If-None-Match / If-Modified-Since
+        etag=content_hash, # The content never changes for this URL
+        max_age=current_app.config['MEDIA_CACHE_MAX_AGE'],
+    )
+    # Logged-in content: browsers may keep it, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    response.headers.setdefault('Accept-Ranges', 'bytes') # werkzeug only adds it to answers of Range requests
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+# Route -> /media/thumb/<sha256>.webp or /media/preview/<sha256>.webp
+@media_bp.route('/<any(thumb, preview):kind>/<string(length=64):content_hash>.webp')
+@login_required
+def media_preview(kind, content_hash):
+    """Sends the thumbnail or preview image of a stored file, once `flask media-worker` has made it."""
+    ready = db.session.query(MediaFile.id).filter(MediaFile.content_hash == content_hash, MediaFile.preview_status == 'ready').first() \
+        or db.session.query(ArchivedMediaFile.id).filter(ArchivedMediaFile.content_hash == content_hash, ArchivedMediaFile.preview_status == 'ready').first()
+    path = os.path.join(os.path.dirname(blob_path(content_hash)), preview_filename(content_hash, kind))
+    if ready is None or not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, mimetype=f'image/{PREVIEW_FORMAT}', conditional=True, etag=f'{content_hash}-{kind}',
+                         max_age=current_app.config['MEDIA_CACHE_MAX_AGE'])
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+# Route -> /media/12/delete
+@media_bp.route('/<int:media_id>/delete', methods=['POST'])
+@login_required
+def media_delete(media_id):
+    """Removes one attachment from its notice or event (the stored file is removed by `flask gc-media`)."""
+    attachment = MediaFile.query.get_or_404(media_id)
+    parent = attachment.notice or attachment.event
+    # Same rule as editing the notice/event: its publisher/organizer or an admin
+    if not current_user.is_admin() and (parent is None or parent.user_id != current_user.id):
+        abort(403)
+
+    # Where to go back to, read before the row is gone
+    if attachment.notice_id:
+        next_url = url_for('notice.notice_detail', notice_id=attachment.notice_id)
+    elif attachment.event_id:
+        next_url = url_for('event.event_detail', event_id=attachment.event_id)
+    else:
+        next_url = url_for('main.index')
+
+    db.session.delete(attachment)
+    if parent is not None:
+        # Counts as an edit, so the detail page's ETag changes and caches drop the old page
+        parent.last_edited_timestamp = func.now()
+        parent.last_edited_by_id = current_user.id
+    db.session.commit()
+    flash('Attachment removed.', 'success')
+    return redirect(next_url)
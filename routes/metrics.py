@@ -0,0 +1,16 @@
+from flask import Blueprint, Response, request, current_app, abort
+from metrics import render_metrics
+
+# Define Blueprint
+# Prometheus scrape endpoint, only reachable from METRICS_ALLOWED_IPS
+metrics_bp = Blueprint('metrics', __name__)
+
+# Route -> /metrics
+@metrics_bp.route('/metrics')
+def metrics():
+    """Request, DB pool and cache metrics in the Prometheus text format."""
+    # 404 rather than 403, so the endpoint isn't advertised to everyone else
+    if request.remote_addr not in current_app.config['METRICS_ALLOWED_IPS']:
+        abort(404)
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
@@ -1,13 +1,21 @@
 from flask import Blueprint, render_template, flash, redirect, url_for, request, abort
 from flask_login import login_required, current_user
 from app import db # Import db from the main app module
-from models import Notice, Department, User # Import necessary models
+from models import MediaFile, Notice, Department, User # Import necessary models
+from caches import department_cache # Cached department catalog
 from forms import NoticeForm # Import the notice form
 # Import decorators if they are defined in a central place, or redefine/import them
 # Assuming decorators are defined in app.py for now, might need refactoring later
 from decorators import publisher_required, admin_required # Adjust import if decorators move
-from datetime import datetime, timedelta # Add these imports
-from sqlalchemy import asc, desc # Import asc and desc from SQLAlchemy if not already implicitly available via db.session
+from datetime import datetime # Add these imports
+from queries import build_notice_query, decode_cursor, fetch_page, notice_detail_query, notice_version_query, attachment_previews # Shared list query builder and keyset pagination
+from feeds import make_feed_key # Notice feed link
+from http_cache import make_validators, not_modified, add_validators, newest # Conditional GET (ETag / Last-Modified)
+from facets import notice_facets # Counts next to the filter options
+from media import attach_uploads # Attachments (content-addressed file store)
+from live_updates import publish_notice # Pushes the change to open list pages
+from media_jobs import utcnow # Naive UTC, the format Notice.issue_date is stored in
+from sqlalchemy.sql import func
 
 # Define Blueprint
 # All routes in this blueprint will be prefixed with /notices
@@ -39,15 +47,11 @@ def notice_list():
     sort_by = request.args.get('sort_by', 'date') # Default sort by date
     sort_order = request.args.get('sort_order', 'desc') # Default descending (newest first)
 
-    # Build Base Query
-    query = Notice.query # Start with query for all Notices
-
-    # Apply Filters
+    # Parse Filters
     start_date = None
     if start_date_str:
         try:
             start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            query = query.filter(Notice.issue_date >= start_date)
         except ValueError:
             flash('Invalid start date format. Please use YYYY-MM-DD.', 'warning')
             start_date_str = None # Clear invalid input for display
@@ -56,62 +60,72 @@ def notice_list():
     if end_date_str:
         try:
             end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            # To include notices ON the end date, filter for less than the *next* day
-            query = query.filter(Notice.issue_date < end_date + timedelta(days=1))
         except ValueError:
             flash('Invalid end date format. Please use YYYY-MM-DD.', 'warning')
             end_date_str = None # Clear invalid input for display
 
     if department_id:
         # Ensure the department actually exists before filtering (optional safety check)
-        dept_exists = Department.query.get(department_id)
-        if dept_exists:
-            query = query.filter(Notice.department_id == department_id)
-        else:
+        dept_exists = department_cache.get(department_id) # Cached, no query
+        if not dept_exists:
             flash(f'Department ID {department_id} not found.', 'warning')
             department_id = None # Reset filter if department doesn't exist
 
-    # Apply Sorting (Newest first by default)
-    if sort_by == 'title':
-        order_column = Notice.title
-    elif sort_by == 'department':
-         # Join with Department table to sort by department name
-         # outerjoin is safer if a notice might not have a department
-        query = query.outerjoin(Department)
-        order_column = Department.name
-    else: # Default to sorting by date
-        sort_by = 'date' # Ensure sort_by reflects the default
-        order_column = Notice.issue_date
-
-    # Apply sort order (ascending or descending)
-    if sort_order == 'asc':
-        query = query.order_by(asc(order_column))
-    else:
-        sort_order = 'desc' # Default to desc if invalid value passed
-        query = query.order_by(desc(order_column))
-
     # Pagination
-    # Get page number from URL query string (?page=N), default to 1
-    page = request.args.get('page', 1, type=int)
-    # Use paginate instead of .all()
-    # per_page: how many items per page (adjust as needed)
-    # error_out=False: prevents 404 error if page number is invalid, shows empty page instead
+    # Pages are addressed by opaque cursor tokens (?after=... / ?before=...) instead of page numbers,
+    # so deep pages cost the same as the first one. Invalid or stale tokens fall back to the first page.
+    sort_key = f'{sort_by}:{sort_order}'
+    cursor = None
+    if request.args.get('before'):
+        cursor = decode_cursor(request.args['before'], sort_key)
+    elif request.args.get('after'):
+        cursor = decode_cursor(request.args['after'], sort_key)
+
+    # Build the filtered, sorted and positioned query (shared with `flask check-query-plans`)
+    query, sort_by, sort_order = build_notice_query(
+        department_id=department_id,
+        start_date=start_date,
+        end_date=end_date,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        cursor=cursor
+    )
+
     try:
-        pagination = query.paginate(page=page, per_page=10, error_out=False)
+        pagination = fetch_page(query, f'{sort_by}:{sort_order}', cursor=cursor, per_page=10)
     except Exception as e:
         # Handle potential database errors during pagination
         flash(f'Error retrieving notices: {e}', 'danger')
         pagination = None
-        notices = []
 
     if pagination:
         notices = pagination.items # Get the list of items for the current page
     else:
         notices = [] # Ensure notices is an empty list if pagination failed
 
+    # Thumbnail of each row's first image/PDF attachment (one query for the page)
+    previews = attachment_previews(MediaFile.notice_id, [notice.id for notice in notices])
+    # Notices per department in the date range (one cached GROUP BY), shown in the filter panel
+    facets = notice_facets(start_date, end_date)
+    # Conditional GET: the page is identified by its rows and the cursors to its neighbours
+    # (a deleted or added row changes them), answer 304 if the browser already has it
+    validators = None
+    if pagination:
+        validators = make_validators(
+            sorted(facets.departments.items(), key=repr), # The counts are part of the page
+            [(row_id, preview.content_hash, preview.preview_status) for row_id, preview in sorted(previews.items())],
+            [(notice.id, notice.issue_date, notice.last_edited_timestamp) for notice in notices],
+            pagination.prev_cursor,
+            pagination.next_cursor,
+            last_modified=newest(*[notice.issue_date for notice in notices], *[notice.last_edited_timestamp for notice in notices])
+        )
+        response = not_modified(validators)
+        if response:
+            return response
+
     # Get Data for Filter Form
     # Fetch departments only if needed (e.g., if the query succeeded)
-    departments = Department.query.order_by(Department.name).all() if pagination else []
+    departments = department_cache.all() if pagination else []
 
     # Store current filters and sorting to pass back to template
     # Ensure values passed back are safe/valid, using None if parsing failed
@@ -123,23 +137,39 @@ def notice_list():
         'sort_order': sort_order
     }
 
-    return render_template(
+    page = render_template(
         'notice_list.html',
         title='Notices',
         notices=notices, # Pass the items for the current page
-        pagination=pagination, # Pass the pagination object for page links
+        previews=previews, # Attachment thumbnails by notice id
+        pagination=pagination, # Pass the keyset page for previous/next links
         departments=departments, # Pass departments for the dropdown
-        current_params=current_params # Pass combined params
+        facets=facets, # Item counts per department
+        current_params=current_params, # Pass combined params
+        feed_key=make_feed_key(current_user) # For the feed link
     )
+    return add_validators(page, validators) if validators else page
 
 # Route is now '/<int:notice_id>' relative to '/notices' -> /notices/123
 @notice_bp.route('/<int:notice_id>')
 @login_required
 def notice_detail(notice_id):
     """Displays the details of a single notice."""
+    # Check the version first (a few small columns), answer 304 if the browser already has it
+    version = notice_version_query(notice_id).first_or_404()
+    validators = make_validators(
+        tuple(version),
+        last_modified=newest(version.issue_date, version.last_edited_timestamp),
+        with_forms=True # Delete button form
+    )
+    response = not_modified(validators)
+    if response:
+        return response
+
     # Get the notice by ID, or return a 404 Not Found error if it doesn't exist
-    notice = Notice.query.get_or_404(notice_id)
-    return render_template('notice_detail.html', title=notice.title, notice=notice)
+    # Publisher, last editor and department are joined in, so rendering issues no extra queries
+    notice = notice_detail_query().get_or_404(notice_id)
+    return add_validators(render_template('notice_detail.html', title=notice.title, notice=notice), validators)
 
 # Route is now '/new' relative to '/notices' -> /notices/new
 @notice_bp.route('/new', methods=['GET', 'POST'])
@@ -152,17 +182,20 @@ def notice_create():
         # Create new Notice object
         notice = Notice(
             title=form.title.data,
-            content=form.content.data,
+            issue_date=utcnow(), # Sorted and paginated on, see Notice.issue_date
             user_id=current_user.id # Set the publisher to the current user
         )
+        notice.set_content(form.content.data) # Also stores the rendered HTML and excerpt
         # Handle optional department ID (0 means 'None' selected)
         if form.department_id.data and form.department_id.data > 0:
             notice.department_id = form.department_id.data
         else:
             notice.department_id = None # Explicitly set to None if 0 or not provided
+        attach_uploads(notice, form.attachments.data) # Streams the files to the store
 
         db.session.add(notice)
         db.session.commit()
+        publish_notice(notice, 'created') # After the commit, browsers may fetch it right away
         flash('Your notice has been posted!', 'success')
         # Use namespaced endpoint for redirect
         return redirect(url_for('notice.notice_list')) # Redirect to the list view
@@ -188,15 +221,19 @@ def notice_edit(notice_id):
     if form.validate_on_submit(): # Runs on POST if data is valid
         # Update the existing notice object's fields
         notice.title = form.title.data
-        notice.content = form.content.data
+        notice.set_content(form.content.data) # Re-renders only if the content changed
         if form.department_id.data and form.department_id.data > 0:
             notice.department_id = form.department_id.data
         else:
             notice.department_id = None
         # Record the current user as the editor to track last editor.
         notice.last_edited_by_id = current_user.id
+        if attach_uploads(notice, form.attachments.data):
+            # New attachments alone don't update the notice row, mark it edited so its ETag changes
+            notice.last_edited_timestamp = func.now()
         # No need for db.session.add(notice) because the object is already tracked
         db.session.commit()
+        publish_notice(notice, 'updated')
         flash('Your notice has been updated!', 'success')
         # Use namespaced endpoint for redirect
         return redirect(url_for('notice.notice_detail', notice_id=notice.id)) # Redirect to detail view
@@ -217,14 +254,12 @@ def notice_delete(notice_id):
         # If the current user is NOT an admin AND they are NOT the original publisher
         abort(403) # Forbidden
 
-    # Delete media files associated with the notice first (if cascade isn't working or for explicit control)
-        # Note: The cascade="all, delete-orphan" on the relationship *should* handle this automatically
-        # for media_file in notice.media_files:
-        #     db.session.delete(media_file)
-            # Optionally delete the actual file from disk here too
+    # The cascade="all, delete-orphan" on the relationship deletes the attachments (MediaFile rows)
+    # The stored files may be shared with other attachments, `flask gc-media` removes unused ones
 
     db.session.delete(notice)
     db.session.commit()
+    publish_notice(notice, 'deleted')
     flash('Notice has been deleted!', 'success')
     # Use namespaced endpoint for redirect
     return redirect(url_for('notice.notice_list')) # Redirect to the list view
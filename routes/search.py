@@ -0,0 +1,91 @@
+import re
+from flask import Blueprint, render_template, request, flash
+from flask_login import login_required
+from markupsafe import escape, Markup
+from sqlalchemy.exc import OperationalError
+from app import db
+
+# Define Blueprint
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+# Highlight markers used inside SQLite, swapped for <mark> tags after HTML-escaping the text
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+# Ranked search over the FTS5 index (see migration 94edd7696388)
+# bm25() weights: a match in the title counts 10x a match in the body
+NOTICE_SEARCH_SQL = db.text("""
+    SELECT notice.id, notice.issue_date,
+           highlight(notice_fts, 0, char(2), char(3)) AS title,
+           snippet(notice_fts, 1, char(2), char(3), '...', 24) AS snippet
+    FROM notice_fts JOIN notice ON notice.id = notice_fts.rowid
+    WHERE notice_fts MATCH :match
+    ORDER BY bm25(notice_fts, 10.0, 1.0)
+    LIMIT :limit
+""").columns(id=db.Integer, issue_date=db.DateTime, title=db.String, snippet=db.String)
+
+EVENT_SEARCH_SQL = db.text("""
+    SELECT event.id, event.event_date,
+           highlight(event_fts, 0, char(2), char(3)) AS title,
+           snippet(event_fts, 1, char(2), char(3), '...', 24) AS snippet,
+           highlight(event_fts, 2, char(2), char(3)) AS venue
+    FROM event_fts JOIN event ON event.id = event_fts.rowid
+    WHERE event_fts MATCH :match
+    ORDER BY bm25(event_fts, 10.0, 1.0, 3.0)
+    LIMIT :limit
+""").columns(id=db.Integer, event_date=db.DateTime, title=db.String, snippet=db.String, venue=db.String)
+
+def build_match_expression(query_text):
+    """Turns free text into a safe FTS5 MATCH expression.
+
+    Every word must match (implicit AND); the last word also matches as a prefix so
+    partial input like "exam sched" finds "exam schedule". Returns None if there are no words.
+    """
+    words = re.findall(r'\w+', query_text)
+    if not words:
+        return None
+    # Quoting each word keeps FTS5 operators (AND, NEAR, column:...) in user input from being interpreted
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def highlight(text):
+    """HTML-escapes FTS output and turns the highlight markers into <mark> tags."""
+    if text is None:
+        return ''
+    return Markup(str(escape(text)).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>'))
+
+# Route -> /search/?q=...&type=all|notices|events
+@search_bp.route('/')
+@login_required
+def search():
+    """Keyword search over notice and event text, ranked by relevance."""
+    query_text = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'all')
+    if search_type not in ('all', 'notices', 'events'):
+        search_type = 'all'
+
+    notices = []
+    events = []
+    match = build_match_expression(query_text)
+    if match:
+        try:
+            if search_type in ('all', 'notices'):
+                notices = db.session.execute(NOTICE_SEARCH_SQL, {'match': match, 'limit': 20}).all()
+            if search_type in ('all', 'events'):
+                events = db.session.execute(EVENT_SEARCH_SQL, {'match': match, 'limit': 20}).all()
+        except OperationalError:
+            # e.g. the search tables don't exist (migration not applied, or not SQLite)
+            db.session.rollback()
+            flash('Search is not available right now.', 'danger')
+
+    return render_template(
+        'search.html',
+        title='Search',
+        query_text=query_text,
+        search_type=search_type,
+        searched=match is not None,
+        notices=notices,
+        events=events,
+        highlight=highlight
+    )
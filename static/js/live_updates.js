@@ -0,0 +1,105 @@
+// static/js/live_updates.js
+
+// Keeps the notice/event list up to date without reloading (Server-Sent Events, see routes/live.py).
+// Edited rows are updated in place and deleted ones removed. New notices are added on top of the
+// first page of the newest-first list, anything else the page can't place shows a refresh banner.
+(function () {
+    const script = document.currentScript;
+    if (!script || !window.EventSource) return;
+
+    const kind = script.dataset.kind; // 'notice' or 'event'
+    // Row cells in column order, filled from the update's fields of the same name
+    const fields = {
+        notice: ['title', 'excerpt', 'department', 'date', 'publisher', 'last_editor'],
+        event: ['title', 'date', 'category', 'department', 'venue', 'organizer'],
+    }[kind];
+    let missed = 0; // Updates only a refresh shows
+
+    function showBanner(message) {
+        const banner = document.getElementById('live-updates-banner');
+        if (!banner) return;
+        banner.querySelector('.live-updates-message').textContent = message;
+        banner.classList.remove('d-none');
+    }
+
+    function highlight(row) {
+        row.classList.add('table-info');
+        setTimeout(() => row.classList.remove('table-info'), 3000);
+    }
+
+    function fillRow(row, update) {
+        // textContent only, titles are user input
+        fields.forEach(field => {
+            const cell = row.querySelector(`[data-field="${field}"]`);
+            if (cell && update[field] != null) cell.textContent = update[field];
+        });
+        const link = row.querySelector('a[data-field="title"]');
+        if (link) link.href = update.url;
+    }
+
+    function newRow(update) {
+        const row = document.createElement('tr');
+        row.dataset.liveId = update.id;
+        fields.forEach(field => {
+            const cell = document.createElement('td');
+            if (field === 'title') {
+                const link = document.createElement('a');
+                link.dataset.field = 'title';
+                cell.appendChild(link);
+            } else {
+                cell.dataset.field = field;
+            }
+            row.appendChild(cell);
+        });
+        fillRow(row, update);
+        return row;
+    }
+
+    function matchesFilters(update) {
+        const banner = document.getElementById('live-updates-banner');
+        if (!banner) return true;
+        const department = Number(banner.dataset.department || 0);
+        const category = banner.dataset.category || '';
+        return (!department || department === update.department_id) && (!category || category === update.category);
+    }
+
+    function apply(update) {
+        const list = document.querySelector(`[data-live-list="${kind}"]`);
+        const row = list && list.querySelector(`tr[data-live-id="${update.id}"]`);
+        if (update.action === 'deleted') {
+            if (row) row.remove();
+            return;
+        }
+        if (row) {
+            fillRow(row, update);
+            highlight(row);
+            return;
+        }
+        // Edits of rows on other pages don't concern this one
+        if (update.action !== 'created' || !matchesFilters(update)) return;
+        if (list && list.dataset.livePrepend === 'true') {
+            const added = newRow(update);
+            list.prepend(added);
+            highlight(added);
+            return;
+        }
+        missed += 1;
+        showBanner(`${missed} new ${kind}${missed === 1 ? '' : 's'} posted.`);
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        const reload = document.querySelector('#live-updates-banner .live-updates-reload');
+        if (reload) {
+            reload.addEventListener('click', event => {
+                event.preventDefault();
+                window.location.reload();
+            });
+        }
+
+        // The browser reconnects by itself (sending the last event id) until the server answers an error
+        const source = new EventSource(script.dataset.url);
+        source.addEventListener(kind, message => apply(JSON.parse(message.data)));
+        // Sent when updates were missed (e.g. a long disconnect), no automatic reload for every open page at once
+        source.addEventListener('reset', () => showBanner('This list may be out of date.'));
+    });
+})();